@@ -17,6 +17,8 @@ In search.py, you will implement generic search algorithms which are called by
 Pacman agents (in searchAgents.py).
 """
 import copy
+import hashlib
+import heapq
 
 import util
 
@@ -62,6 +64,90 @@ class SearchProblem:
         """
         util.raiseNotDefined()
 
+class FingerprintSet:
+    """
+    A closed set for very large state spaces that stores a fixed-width fingerprint
+    of every state instead of the state itself (hash compaction).
+
+    Two different states with the same fingerprint are treated as the same
+    state, so a search can wrongly skip a state it never visited. With b-bit
+    fingerprints and n stored states the chance that a lookup of a new state is
+    a false positive is about n / 2^b, and the expected number of states that
+    are wrongly skipped over the whole search is about n^2 / 2^(b+1).
+
+    Fingerprints are a 64-bit BLAKE2 digest of a canonical byte encoding of the
+    state (see stateBytes), not the state's own __hash__: Python reduces integer
+    hashes modulo 2^61 - 1, so food grids whose food sits 61 cells apart would
+    always collide. Two food states whose grids hash alike are told apart:
+
+    >>> from game import Grid
+    >>> food, other = Grid(21, 11), Grid(21, 11)
+    >>> food[0][0] = other[5][6] = True
+    >>> hash(food) == hash(other)
+    True
+    >>> closed = FingerprintSet()
+    >>> closed.add(((1, 1), food))
+    >>> ((1, 1), other) in closed
+    False
+    """
+
+    def __init__(self, bits=64):
+        self.bits = bits
+        self.mask = (1 << bits) - 1
+        self.fingerprints = set()
+
+    def fingerprint(self, state):
+        digest = hashlib.blake2b(stateBytes(state), digest_size=8).digest()
+        return int.from_bytes(digest, 'big') & self.mask
+
+    def add(self, state):
+        self.fingerprints.add(self.fingerprint(state))
+
+    def __contains__(self, state):
+        return self.fingerprint(state) in self.fingerprints
+
+    def __len__(self):
+        return len(self.fingerprints)
+
+    def falsePositiveRate(self):
+        """ Probability that an unvisited state is reported as visited. """
+        return len(self) / 2 ** self.bits
+
+    def expectedOmissions(self):
+        """ Expected number of states skipped because of a collision during the search so far. """
+        return len(self) ** 2 / 2 ** (self.bits + 1)
+
+def stateBytes(state):
+    """
+    Canonical byte encoding of a search state: tuples and lists item by item,
+    grids (anything with packBits, like game.Grid) by their packed bits, and
+    everything else, like positions and booleans, by its repr.
+    """
+    if isinstance(state, (tuple, list)):
+        return b'(' + b','.join(stateBytes(item) for item in state) + b')'
+    if hasattr(state, 'packBits'):
+        return b'G' + repr(state.packBits()).encode()
+    return repr(state).encode()
+
+def newClosedSet(closedMode='exact'):
+    """
+    Returns an empty closed set for a search.
+
+      closedMode: 'exact' stores the full states (no false positives),
+                  'compact' stores 64-bit fingerprints only (see FingerprintSet)
+    """
+    if closedMode == 'exact':
+        return set()
+    if closedMode == 'compact':
+        return FingerprintSet()
+    raise ValueError(str(closedMode) + ' is not a closed set mode, use exact or compact.')
+
+def reportClosedSet(closed):
+    """ Prints the size and the expected false positives of a hash-compacted closed set. """
+    if isinstance(closed, FingerprintSet):
+        print('[search] compact closed set: %d fingerprints of %d bits, false positive rate %.2e, expected skipped states %.2e'
+              % (len(closed), closed.bits, closed.falsePositiveRate(), closed.expectedOmissions()))
+
 def tinyMazeSearch(problem):
     """
     Returns a sequence of moves that solves tinyMaze.  For any other maze, the
@@ -72,7 +158,7 @@ def tinyMazeSearch(problem):
     w = Directions.WEST
     return  [s, s, w, s, w, w, s, w]
 
-def depthFirstSearch(problem: SearchProblem):
+def depthFirstSearch(problem: SearchProblem, closedMode='exact'):
     """
     Search the deepest nodes in the search tree first.
 
@@ -128,15 +214,17 @@ def depthFirstSearch(problem: SearchProblem):
             path = path[:currentBranch[0]]
     return path
     """
-    closed = set() #set of states that are already visited
+    closed = newClosedSet(closedMode) #set of states that are already visited
     fringe = util.Stack() #process these states next
     fringe.push(((problem.getStartState()),[])) #startstate
 
     while True:
         if fringe.isEmpty(): #if fringe is empty, no solution found
+            reportClosedSet(closed)
             return False
         node = fringe.pop() #get next node in fringe
         if problem.isGoalState(node[0]): #check if node is goal
+            reportClosedSet(closed)
             return node[1] #return the path to get to this node
         if node[0] not in closed: #if it is visited yet, skip and go to next node
             closed.add(node[0])
@@ -145,17 +233,19 @@ def depthFirstSearch(problem: SearchProblem):
                 newpath.append(child[1])
                 fringe.push((child[0],newpath)) #add next node to fringe to visit next
 
-def breadthFirstSearch(problem: SearchProblem):
+def breadthFirstSearch(problem: SearchProblem, closedMode='exact'):
     """Search the shallowest nodes in the search tree first."""
-    closed = set() #set of states that are already visited
+    closed = newClosedSet(closedMode) #set of states that are already visited
     fringe = util.Queue() #process these states next
     fringe.push(((problem.getStartState()),[])) #startstate
 
     while True:
         if fringe.isEmpty(): #if fringe is empty, no solution found
+            reportClosedSet(closed)
             return False
         node = fringe.pop() #get next node in fringe
         if problem.isGoalState(node[0]): #check if node is goal
+            reportClosedSet(closed)
             return node[1] #return the path to get to this node
         if node[0] not in closed: #if it is visited yet, skip and go to next node
             closed.add(node[0])
@@ -164,17 +254,19 @@ def breadthFirstSearch(problem: SearchProblem):
                 newpath.append(child[1])
                 fringe.push((child[0],newpath)) #add next node to fringe to visit next
 
-def uniformCostSearch(problem: SearchProblem):
+def uniformCostSearch(problem: SearchProblem, closedMode='exact'):
     """Search the node of least total cost first."""
-    closed = set()  # set of states that are already visited
+    closed = newClosedSet(closedMode)  # set of states that are already visited
     fringe = util.PriorityQueue()  # process these states next
     fringe.push((problem.getStartState(), [], 0),0)  # startstate
 
     while True:
         if fringe.isEmpty(): #if fringe is empty, no solution found
+            reportClosedSet(closed)
             return False
         node = fringe.pop() #get next node in fringe
         if problem.isGoalState(node[0]): #check if node is goal
+            reportClosedSet(closed)
             return node[1] #return the path to get to this node
         if node[0] not in closed: #if it is visited yet, skip and go to next node
             closed.add(node[0])
@@ -191,28 +283,83 @@ def nullHeuristic(state, problem=None):
     """
     return 0
 
-def aStarSearch(problem: SearchProblem, heuristic=nullHeuristic):
+def heuristicValues(heuristic, states, problem):
+    """
+    Returns the heuristic values of sibling states (all successors of one node).
+
+    A heuristic can evaluate all siblings in one call, sharing the work between
+    them, by having a `batch` attribute: a function (states, problem) that
+    returns a list with a value per state. Other heuristics are called once per
+    state.
+    """
+    if hasattr(heuristic, 'batch'):
+        return heuristic.batch(states, problem)
+    return [heuristic(state, problem) for state in states]
+
+def aStarSearch(problem: SearchProblem, heuristic=nullHeuristic, closedMode='exact'):
     """Search the node that has the lowest combined cost and heuristic first."""
-    closed = set()  # set of states that are already visited
+    closed = newClosedSet(closedMode)  # set of states that are already visited
     fringe = util.PriorityQueue()  # process these states next
     fringe.push((problem.getStartState(), [], 0),0)  # startstate
 
     while True:
         if fringe.isEmpty(): #if fringe is empty, no solution found
+            reportClosedSet(closed)
             return False
         node = fringe.pop() #get next node in fringe
         if problem.isGoalState(node[0]): #check if node is goal
+            reportClosedSet(closed)
             return node[1] #return the path to get to this node
         if node[0] not in closed: #if it is visited yet, skip and go to next node
             closed.add(node[0])
-            for child in problem.getSuccessors(node[0]): #add all the successors of this node
+            successors = problem.getSuccessors(node[0])
+            heuristics = heuristicValues(heuristic, [child[0] for child in successors], problem) #evaluate all successors at once
+            for child, childHeuristic in zip(successors, heuristics): #add all the successors of this node
                 newpath = copy.deepcopy(node[1])  #copy the path to get to this node
                 newpath.append(child[1])
                 totalcost = node[2]+child[2] #calculate the cost to go to new node
-                fringe.push((child[0],newpath,totalcost),totalcost+heuristic(child[0],problem))#add next node to fringe to visit next
+                fringe.push((child[0],newpath,totalcost),totalcost+childHeuristic)#add next node to fringe to visit next
+
+def beamSearch(problem: SearchProblem, heuristic=nullHeuristic, beamWidth=100, closedMode='exact'):
+    """
+    Search the nodes layer by layer, keeping only the beamWidth nodes of every
+    layer with the lowest combined cost and heuristic.
+
+    Memory and time per layer are bounded by the beam width instead of growing
+    with the state space, in exchange the path found is not always the cheapest
+    one, and no path is found when the beam drops every way to the goal: then
+    None is returned, which SearchAgent turns into an empty list of actions.
+    """
+    closed = newClosedSet(closedMode) # states that were kept in an earlier layer
+    layer = [(problem.getStartState(), [], 0)] # nodes of the current depth
+    closed.add(layer[0][0])
+    counter = 0 # tie breaker so that states never get compared
+
+    while len(layer) > 0:
+        for node in layer:
+            if problem.isGoalState(node[0]): #check if node is goal
+                reportClosedSet(closed)
+                return node[1] #return the path to get to this node
+        children = {} # state -> (f, counter, node), only the cheapest way to every state of the next layer
+        for node in layer:
+            successors = problem.getSuccessors(node[0])
+            heuristics = heuristicValues(heuristic, [child[0] for child in successors], problem)
+            for child, childHeuristic in zip(successors, heuristics):
+                if child[0] in closed:
+                    continue
+                totalcost = node[2]+child[2] #calculate the cost to go to new node
+                if child[0] not in children or totalcost+childHeuristic < children[child[0]][0]:
+                    counter += 1
+                    children[child[0]] = (totalcost+childHeuristic, counter, (child[0], node[1]+[child[1]], totalcost))
+        layer = [child[2] for child in heapq.nsmallest(beamWidth, children.values())] #keep the best nodes
+        for node in layer:
+            closed.add(node[0])
+    reportClosedSet(closed)
+    return None #the beam ran empty, no solution found
 
 # Abbreviations
 bfs = breadthFirstSearch
 dfs = depthFirstSearch
 astar = aStarSearch
 ucs = uniformCostSearch
+beam = beamSearch
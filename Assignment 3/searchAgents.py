@@ -47,6 +47,9 @@ import pacman
 from util import manhattanDistance
 from itertools import permutations
 import sys
+import heapq
+import weakref
+from collections import deque
 
 
 class GoWestAgent(Agent):
@@ -260,6 +263,28 @@ class StayWestSearchAgent(SearchAgent):
         costFn = lambda pos: 2 ** pos[0]
         self.searchType = lambda state: PositionSearchProblem(state, costFn)
 
+class ClosedModeSearchAgent(SearchAgent):
+    """
+    A SearchAgent that also chooses how its search function stores the closed set.
+
+    Options for closedMode include:
+      exact    stores every visited state (default)
+      compact  stores 64-bit fingerprints of the visited states, for state
+               spaces that do not fit in memory (see search.FingerprintSet)
+    """
+    def __init__(self, fn='depthFirstSearch', prob='PositionSearchProblem', heuristic='nullHeuristic', closedMode='exact'):
+        SearchAgent.__init__(self, fn, prob, heuristic)
+        search.newClosedSet(closedMode) # Fail early on an unknown mode
+        func = getattr(search, fn)
+        if 'closedMode' not in func.__code__.co_varnames:
+            raise AttributeError(fn + ' does not take a closedMode.')
+        print('[ClosedModeSearchAgent] using %s closed set' % closedMode)
+        if 'heuristic' not in func.__code__.co_varnames:
+            self.searchFunction = lambda x: func(x, closedMode=closedMode)
+        else:
+            heur = globals()[heuristic] if heuristic in globals().keys() else getattr(search, heuristic)
+            self.searchFunction = lambda x: func(x, heuristic=heur, closedMode=closedMode)
+
 def manhattanHeuristic(position, problem, info={}):
     "The Manhattan distance heuristic for a PositionSearchProblem"
     xy1 = position
@@ -272,6 +297,62 @@ def euclideanHeuristic(position, problem, info={}):
     xy2 = problem.goal
     return ( (xy1[0] - xy2[0]) ** 2 + (xy1[1] - xy2[1]) ** 2 ) ** 0.5
 
+NUM_LANDMARKS = 8 # Number of landmarks the landmarkHeuristic picks per layout
+_landmarkTables = weakref.WeakKeyDictionary() # walls Grid -> landmark distances, dropped with the layout
+
+def gridDistances(walls, source):
+    "Returns a dict with the maze distance from source to every position reachable from it."
+    distances = {source: 0}
+    fringe = deque([source])
+    while fringe:
+        x, y = fringe.popleft()
+        for nextx, nexty in ((x, y+1), (x, y-1), (x+1, y), (x-1, y)):
+            if not walls[nextx][nexty] and (nextx, nexty) not in distances:
+                distances[(nextx, nexty)] = distances[(x, y)] + 1
+                fringe.append((nextx, nexty))
+    return distances
+
+def landmarkDistances(walls, k=NUM_LANDMARKS):
+    """
+    Picks k landmarks on the layout with farthest-point selection and returns the
+    maze distances from each of them.
+    """
+    positions = walls.asList(False)
+    distances = []
+    closest = {position: float('inf') for position in positions} # Distance to the closest landmark so far
+    landmark = max(gridDistances(walls, positions[0]).items(), key=lambda item: item[1])[0] # Start far away from an arbitrary position
+    for i in range(min(k, len(positions))):
+        distances.append(gridDistances(walls, landmark))
+        for position in positions:
+            closest[position] = min(closest[position], distances[-1].get(position, float('inf')))
+        landmark = max(positions, key=lambda position: closest[position])
+    return distances
+
+def landmarkHeuristic(position, problem, info={}):
+    """
+    The ALT (A*, landmarks, triangle inequality) heuristic for a PositionSearchProblem
+    with unit step costs. For every landmark L the triangle inequality gives
+    |d(L,goal) - d(L,position)| <= d(position,goal), which unlike the Manhattan
+    distance takes the walls into account.
+
+    The landmark distances are computed once per layout and shared by all its
+    problems, as mazeDistance makes a new problem per query. Every problem
+    looks them up by its walls once and keeps them in problem.heuristicInfo,
+    which is added to the problem if it has none.
+    """
+    if not hasattr(problem, 'heuristicInfo'):
+        problem.heuristicInfo = {}
+    if 'landmarks' not in problem.heuristicInfo:
+        if problem.walls not in _landmarkTables:
+            _landmarkTables[problem.walls] = landmarkDistances(problem.walls)
+        problem.heuristicInfo['landmarks'] = _landmarkTables[problem.walls]
+    xy2 = problem.goal
+    heuristic = abs(position[0] - xy2[0]) + abs(position[1] - xy2[1])
+    for distances in problem.heuristicInfo['landmarks']:
+        if position in distances and xy2 in distances:
+            heuristic = max(heuristic, abs(distances[xy2] - distances[position]))
+    return heuristic
+
 #####################################################
 # This portion is incomplete.  Time to write code!  #
 #####################################################
@@ -384,8 +465,8 @@ def cornersHeuristic(state: Any, problem: CornersProblem):
 
 class AStarCornersAgent(SearchAgent):
     "A SearchAgent for FoodSearchProblem using A* and your foodHeuristic"
-    def __init__(self):
-        self.searchFunction = lambda prob: search.aStarSearch(prob, cornersHeuristic)
+    def __init__(self, closedMode='exact'):
+        self.searchFunction = lambda prob: search.aStarSearch(prob, cornersHeuristic, closedMode=closedMode)
         self.searchType = CornersProblem
 
 class FoodSearchProblem:
@@ -440,9 +521,40 @@ class FoodSearchProblem:
 
 class AStarFoodSearchAgent(SearchAgent):
     "A SearchAgent for FoodSearchProblem using A* and your foodHeuristic"
-    def __init__(self):
-        self.searchFunction = lambda prob: search.aStarSearch(prob, foodHeuristic)
+    def __init__(self, closedMode='exact'):
+        self.searchFunction = lambda prob: search.aStarSearch(prob, foodHeuristic, closedMode=closedMode)
+        self.searchType = FoodSearchProblem
+
+class BeamFoodSearchAgent(SearchAgent):
+    """
+    A SearchAgent for FoodSearchProblem using beam search and your foodHeuristic,
+    for boards where optimal search runs out of memory or time.
+
+    beamWidth: number of nodes kept per layer
+    baseline:  'ucs' or 'astar' to also run that optimal search and print its
+               cost next to the beam search cost, 'none' to skip it
+    closedMode: 'exact' or 'compact', see search.newClosedSet
+    """
+    def __init__(self, beamWidth='100', baseline='none', closedMode='exact'):
+        self.searchFunction = lambda prob: search.beamSearch(prob, foodHeuristic, beamWidth=int(beamWidth), closedMode=closedMode)
         self.searchType = FoodSearchProblem
+        self.baseline = baseline
+
+    def registerInitialState(self, state):
+        SearchAgent.registerInitialState(self, state)
+        if not self.actions and state.getNumFood() > 0:
+            print('Beam search found no path, try a wider beam')
+            return
+        if self.baseline == 'none':
+            return
+        baselines = {'ucs': search.uniformCostSearch, 'astar': lambda prob: search.aStarSearch(prob, foodHeuristic)}
+        if self.baseline not in baselines:
+            raise AttributeError(self.baseline + ' is not a baseline, use none, ucs or astar.')
+        starttime = time.time()
+        problem = FoodSearchProblem(state)
+        baselineCost = problem.getCostOfActions(baselines[self.baseline](problem))
+        print('Beam search cost %d, %s baseline cost %d (found in %.1f seconds)'
+              % (len(self.actions), self.baseline, baselineCost, time.time() - starttime))
 
 def foodHeuristic(state: Tuple[Tuple, List[List]], problem: FoodSearchProblem):
     """
@@ -506,6 +618,38 @@ def foodHeuristic(state: Tuple[Tuple, List[List]], problem: FoodSearchProblem):
         heuristic = max(distance, heuristic) # Heuristic is max value between new distance and old max value
     return heuristic
 
+def foodHeuristicBatch(states: List[Tuple[Tuple, List[List]]], problem: FoodSearchProblem):
+    """
+    Computes foodHeuristic for all successors of one node at once (see
+    search.heuristicValues).
+
+    The successors only differ from their parent's food grid in the position
+    they moved to, so the food list is built once for all of them, and the maze
+    distances are looked up in one breadth first distance table per food dot
+    (stored in problem.heuristicInfo) instead of one mazeDistance per pair.
+    """
+    if len(states) == 0:
+        return []
+    # Food of the parent node: the food of any successor plus its own position if another successor still has food there
+    (firstPosition, firstFood) = states[0]
+    allFood = firstFood.asList()
+    if any(food[firstPosition[0]][firstPosition[1]] for _, food in states[1:]):
+        allFood.append(firstPosition)
+    distanceTables = problem.heuristicInfo.setdefault('distanceTables', {}) # food position -> maze distances from it
+    for food in allFood:
+        if food not in distanceTables:
+            distanceTables[food] = gridDistances(problem.walls, food)
+    tables = [distanceTables[food] for food in allFood]
+    heuristics = []
+    for position, _ in states:
+        heuristic = 0
+        for distances in tables: # The food on the successor's own position is eaten and has distance 0 anyway
+            heuristic = max(distances[position], heuristic)
+        heuristics.append(heuristic)
+    return heuristics
+
+foodHeuristic.batch = foodHeuristicBatch
+
 class ClosestDotSearchAgent(SearchAgent):
     "Search for all food using a sequence of searches"
     def registerInitialState(self, state):
@@ -581,3 +725,151 @@ def mazeDistance(point1: Tuple[int, int], point2: Tuple[int, int], gameState: pa
     assert not walls[x2][y2], 'point2 is a wall: ' + str(point2)
     prob = PositionSearchProblem(gameState, start=point1, goal=point2, warn=False, visualize=False)
     return len(search.bfs(prob))
+
+class LifelongPlanner:
+    """
+    An incremental planner (D* Lite) for repeated position searches on the same
+    layout, for example the searches of the ClosestDotSearchAgent or repeated
+    mazeDistance calls.
+
+    The planner searches backwards from the goal positions to Pacman and keeps
+    its g and rhs values between queries, so when Pacman moves or a goal
+    disappears only the part of the search that is affected gets repaired
+    instead of searching again from scratch.
+
+    costFn gives the cost of stepping into a position like in
+    PositionSearchProblem, heuristic(a, b) must be admissible for that cost.
+    """
+
+    def __init__(self, walls, costFn=lambda x: 1, heuristic=manhattanDistance):
+        self.walls = walls
+        self.costFn = costFn
+        self.heuristic = heuristic
+        self.g, self.rhs = {}, {} # Missing positions have an infinite g/rhs value
+        self.goals = set()
+        self.start = self.last = None
+        self.km = 0 # Key modifier, grows with every move of the start
+        self.heap = [] # (key, position); an entry is stale if its key is not in self.queued
+        self.queued = {}
+        self._expanded = 0 # Number of positions expanded over all queries
+
+    def getSuccessors(self, position):
+        "Returns the (position, action) pairs reachable in one step; the maze is undirected."
+        successors = []
+        for action in [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST]:
+            dx, dy = Actions.directionToVector(action)
+            nextx, nexty = int(position[0] + dx), int(position[1] + dy)
+            if not self.walls[nextx][nexty]:
+                successors.append(((nextx, nexty), action))
+        return successors
+
+    def calculateKey(self, position):
+        best = min(self.g.get(position, float('inf')), self.rhs.get(position, float('inf')))
+        return (best + self.heuristic(self.start, position) + self.km, best)
+
+    def updateVertex(self, position):
+        if position not in self.goals:
+            self.rhs[position] = min([self.costFn(next) + self.g.get(next, float('inf')) for next, _ in self.getSuccessors(position)], default=float('inf'))
+        self.queued.pop(position, None)
+        if self.g.get(position, float('inf')) != self.rhs.get(position, float('inf')):
+            key = self.calculateKey(position)
+            self.queued[position] = key
+            heapq.heappush(self.heap, (key, position))
+
+    def computeShortestPath(self):
+        while self.heap:
+            key, position = self.heap[0]
+            if self.queued.get(position) != key: # Outdated entry, the position was updated since
+                heapq.heappop(self.heap)
+                continue
+            startG = self.g.get(self.start, float('inf'))
+            if key >= self.calculateKey(self.start) and self.rhs.get(self.start, float('inf')) == startG:
+                break
+            self._expanded += 1
+            newKey = self.calculateKey(position)
+            if key < newKey: # The key is outdated because the start moved
+                heapq.heapreplace(self.heap, (newKey, position))
+                self.queued[position] = newKey
+            elif self.g.get(position, float('inf')) > self.rhs[position]: # Overconsistent, settle it
+                heapq.heappop(self.heap)
+                del self.queued[position]
+                self.g[position] = self.rhs[position]
+                for previous, _ in self.getSuccessors(position):
+                    self.updateVertex(previous)
+            else: # Underconsistent, a path got longer
+                self.g[position] = float('inf')
+                for previous, _ in self.getSuccessors(position):
+                    self.updateVertex(previous)
+                self.updateVertex(position)
+
+    def setStart(self, start):
+        "Moves the start; the keys in the queue stay valid thanks to the key modifier."
+        if self.last is not None:
+            self.km += self.heuristic(self.last, start)
+        self.start = self.last = start
+
+    def setGoals(self, goals):
+        "Replaces the goal positions and repairs the positions whose goal status changed."
+        goals = set(goals)
+        changed = goals.symmetric_difference(self.goals)
+        self.goals = goals
+        for goal in goals.intersection(changed):
+            self.rhs[goal] = 0
+        for position in changed:
+            self.updateVertex(position)
+
+    def plan(self, start, goals):
+        "Brings the g values up to date for this start and these goals."
+        self.setStart(start)
+        self.setGoals(goals)
+        self.computeShortestPath()
+
+    def distance(self, start, goals):
+        "Returns the cost of the cheapest path from start to any of the goals."
+        self.plan(start, goals)
+        return self.g.get(start, float('inf'))
+
+    def getPath(self, start, goals):
+        "Returns a list of actions from start to the closest goal, or None if there is none."
+        self.plan(start, goals)
+        if self.g.get(start, float('inf')) == float('inf'):
+            return None
+        actions = []
+        position = start
+        while position not in self.goals:
+            position, action = min(self.getSuccessors(position), key=lambda successor: self.costFn(successor[0]) + self.g.get(successor[0], float('inf')))
+            actions.append(action)
+        return actions
+
+class LifelongClosestDotSearchAgent(ClosestDotSearchAgent):
+    "Search for all food using one LifelongPlanner that is repaired between the searches"
+    def registerInitialState(self, state):
+        self.planner = None
+        self.planningTime, self.planningSteps = 0, 0
+        ClosestDotSearchAgent.registerInitialState(self, state)
+        expanded = self.planner._expanded if self.planner is not None else 0 # No planner if there was no food
+        print('Average planning time per step: %.6f seconds (%d steps, %d positions expanded)'
+              % (self.planningTime / max(self.planningSteps, 1), self.planningSteps, expanded))
+
+    def findPathToClosestDot(self, gameState: pacman.GameState):
+        starttime = time.time()
+        if self.planner is None:
+            self.planner = LifelongPlanner(gameState.getWalls())
+        path = self.planner.getPath(gameState.getPacmanPosition(), gameState.getFood().asList())
+        self.planningTime += time.time() - starttime
+        self.planningSteps += 1
+        return path
+
+def lifelongMazeDistance(point1: Tuple[int, int], point2: Tuple[int, int], gameState: pacman.GameState, planners: dict) -> int:
+    """
+    Returns the same maze distance as mazeDistance, but reuses one LifelongPlanner
+    per goal (point2) from planners, a dict the caller keeps for one layout, e.g.
+    problem.heuristicInfo.setdefault('planners', {}).
+
+    The planner searches backwards from the goal, so pass the endpoint that stays
+    fixed as point2: repeated calls with a moving point1 (Pacman) only repair the
+    previous search. Example: lifelongMazeDistance(position, food, gameState, planners)
+    """
+    if point2 not in planners:
+        planners[point2] = LifelongPlanner(gameState.getWalls())
+    return planners[point2].distance(point1, [point2])
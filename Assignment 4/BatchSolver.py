@@ -0,0 +1,145 @@
+""" Solves files with many Sudoku puzzles in a pool of processes.
+    The input has one puzzle per line in the format of `Sudoku::parseLine`, the output gets the solution of every puzzle
+    on the same line number, or "no solution". Blank lines get "no puzzle" and lines that can't be parsed get "error: "
+    followed by the reason. Puzzles are streamed: only a bounded window of lines is in memory at once.
+
+    The default method is Dancing Links, the fastest solver on 9x9 puzzles; the CSP solvers are there to compare
+    configurations, or for boards too large for the exact cover matrix.
+
+    Usage: python BatchSolver.py puzzles.txt solutions.txt [--processes N] [--chunksize N] [--method NAME]
+                                 [--options JSON] [--telemetry PATH]
+"""
+import argparse
+import contextlib
+import json
+import os
+import random
+import time
+
+from itertools import islice
+from multiprocessing import Pool
+from typing import Dict, Iterable, List, Tuple, Optional
+
+from Sudoku import Sudoku
+
+
+NO_SOLUTION = "no solution"
+NO_PUZZLE = "no puzzle" # Output for a blank input line
+ERROR = "error: " # Start of the output for a line that failed, followed by the reason
+SAMPLE_SIZE = 10000 # Number of latencies kept for the percentiles, so memory doesn't grow with the corpus
+
+_sudoku = None # Sudoku of the worker process, reused for all its puzzles
+_method = None
+_telemetry = False
+
+
+def _initWorker(method: str, options: Dict, telemetry: bool = False):
+    global _sudoku, _method, _telemetry
+    _sudoku = Sudoku(**options)
+    _method = method
+    _telemetry = telemetry
+
+
+def solveLine(line: str) -> Tuple[str, float, Optional[str]]:
+    """ Solves one puzzle in a worker process.
+        :return: the solution line (or NO_SOLUTION, NO_PUZZLE, or ERROR and the reason), the time spent solving in
+                 seconds, and the `SolveStats` of the solve as JSON if the worker records telemetry and searched the line.
+    """
+    if not line.strip():
+        return NO_PUZZLE, 0.0, None
+    start = time.perf_counter()
+    try:
+        result = getattr(_sudoku, _method)(_sudoku.parseLine(line))
+    except Exception as error:
+        return ERROR + (str(error) or type(error).__name__), time.perf_counter() - start, None
+    seconds = time.perf_counter() - start
+    stats = _sudoku.lastStats.toJson() if _telemetry else None
+    return (_sudoku.assignmentToLine(result) if result is not None else NO_SOLUTION), seconds, stats
+
+
+class BatchStats:
+    """ Throughput and latency of a batch, latency percentiles are estimated from a reservoir sample. """
+
+    def __init__(self, sampleSize: int = SAMPLE_SIZE, seed: int = 0):
+        self.puzzles = 0
+        self.solved = 0
+        self.seconds = 0.0 # Wall clock time of the whole batch
+        self.maxLatency = 0.0
+        self.sample = []
+        self.sampleSize = sampleSize
+        self.random = random.Random(seed)
+
+    def add(self, solved: bool, latency: float):
+        self.puzzles += 1
+        self.solved += solved
+        self.maxLatency = max(self.maxLatency, latency)
+        if len(self.sample) < self.sampleSize:
+            self.sample.append(latency)
+        else:
+            i = self.random.randrange(self.puzzles)
+            if i < self.sampleSize:
+                self.sample[i] = latency
+
+    def percentile(self, p: float) -> float:
+        """ :return: the latency in seconds below which p percent of the puzzles were solved. """
+        if not self.sample:
+            return 0.0
+        ordered = sorted(self.sample)
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+    def report(self) -> str:
+        rate = self.puzzles / self.seconds if self.seconds else 0.0
+        return (f"{self.solved}/{self.puzzles} puzzles solved in {self.seconds:.1f}s, {rate:.1f} puzzles/s\n"
+                f"latency p50 {self.percentile(50) * 1000:.2f}ms, p90 {self.percentile(90) * 1000:.2f}ms, "
+                f"p99 {self.percentile(99) * 1000:.2f}ms, max {self.maxLatency * 1000:.2f}ms")
+
+
+def batches(lines: Iterable[str], size: int) -> Iterable[List[str]]:
+    """ Splits the lines into lists of at most size lines, reading lazily. """
+    lines = iter(lines)
+    while True:
+        batch = list(islice(lines, size))
+        if not batch:
+            return
+        yield batch
+
+
+def solveFile(inputPath: str, outputPath: str, processes: int = None, chunksize: int = 64,
+              method: str = "solveDancingLinks", options: Dict = None, telemetryPath: str = None) -> BatchStats:
+    """ Solves every puzzle of the input file and writes the solutions to the output file as they come in.
+        At most a window of a few chunks per process is read ahead, so memory stays flat for any corpus size.
+        :param method: name of the solve method of `Sudoku`.
+        :param options: keyword arguments for the `Sudoku` of every worker, by default AllDifferent propagation for the CSP solvers.
+        :param telemetryPath: file that gets the `SolveStats` of every puzzle that was searched as JSON lines, in the order of the input.
+    """
+    options = options or {'allDifferent': True}
+    stats = BatchStats()
+    start = time.perf_counter()
+    with Pool(processes, _initWorker, (method, options, telemetryPath is not None)) as pool, open(inputPath) as puzzles, \
+            open(outputPath, "w") as solutions, \
+            (open(telemetryPath, "w") if telemetryPath is not None else contextlib.nullcontext()) as telemetry:
+        window = (processes or os.cpu_count() or 1) * chunksize * 4
+        for batch in batches(puzzles, window):
+            for solution, latency, record in pool.imap(solveLine, batch, chunksize):
+                solutions.write(solution + "\n")
+                if solution != NO_PUZZLE:
+                    stats.add(solution != NO_SOLUTION and not solution.startswith(ERROR), latency)
+                if record is not None:
+                    telemetry.write(record + "\n")
+            solutions.flush()
+    stats.seconds = time.perf_counter() - start
+    return stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Solve a file with one Sudoku puzzle per line.")
+    parser.add_argument("input")
+    parser.add_argument("output")
+    parser.add_argument("--processes", type=int, default=None, help="number of worker processes (default: all cores)")
+    parser.add_argument("--chunksize", type=int, default=64, help="puzzles handed to a worker at once")
+    parser.add_argument("--method", default="solveDancingLinks", help="solve method of Sudoku")
+    parser.add_argument("--options", type=json.loads, default=None,
+                        help='keyword arguments for Sudoku as a JSON object, e.g. \'{"allDifferent": true}\'')
+    parser.add_argument("--telemetry", default=None, help="write the stats of every solve to this file as JSON lines")
+    args = parser.parse_args()
+    print(solveFile(args.input, args.output, args.processes, args.chunksize, args.method, args.options, args.telemetry).report())
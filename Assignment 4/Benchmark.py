@@ -0,0 +1,391 @@
+""" Benchmarks for the CSP solvers on Sudoku puzzles.
+    Run `python Benchmark.py` from this directory to print all tables.
+"""
+import inspect
+import random
+import time
+import tracemalloc
+
+from typing import List, Tuple, Dict
+
+from Sudoku import Sudoku, valueToChar
+from Portfolio import solvePortfolio
+from ParallelSearch import solveParallel
+
+
+# Puzzles written on one line, row by row, '.' for an empty cell
+EASY = ["..3.2.6..9..3.5..1..18.64....81.29..7.......8..67.82....26.95..8..2.3..9..5.1.3..",
+        "2...8.3...6..7..84.3.5..2.9...1.54.8.........4.27.6...3.1..7.4.72..4..6...4.1...3",
+        "......9.7...42.18....7.5.261..9.4....5.....4....5.7..992.1.8....34.59...5.7......",
+        ".3..5..4...8.1.5..46.....12.7.5.2.8....6.3....4.1.9.3.25.....98..1.2.6...8..6..2."]
+HARD = ["4.....8.5.3..........7......2.....6.....8.4......1.......6.3.7.5..2.....1.4......",
+        "52...6.........7.13...........4..8..6......5...........418.........3..2...87.....",
+        "6.....8.3.4.7.................5.4.7.3..2.....1.6.......2.....5.....8.6......1....",
+        "48.3............71.2.......7.5....6....2..8.............1.76...3.....4......5....",
+        "1....7.9..3..2...8..96..5....53..9...1..8...26....4...3......1..4......7..7...3.."]
+# 4x4 puzzles whose givens already break a constraint, so they have no solution
+CONTRADICTORY = ["..4....23.34..3.", ".12.....1..1.1..", "....41..44...1.4"]
+# 4x4 puzzle whose givens don't conflict, but leave the third cell of the first row no value
+UNSOLVABLE = "12........3...4."
+
+
+def solvePuzzle(sudoku: Sudoku, line: str, method: str) -> Tuple[bool, float]:
+    """ Solves one puzzle with the solve method with this name.
+        :return: whether a valid solution was found, and the time it took in seconds.
+    """
+    initialAssignment = sudoku.parseLine(line)
+    start = time.perf_counter()
+    result = getattr(sudoku, method)(initialAssignment)
+    seconds = time.perf_counter() - start
+    return result is not None and sudoku.isComplete(result) and sudoku.isValid(result), seconds
+
+
+def peakMemory(sudoku: Sudoku, line: str, method: str) -> int:
+    """ :return: the peak number of bytes allocated by Python while solving the puzzle. """
+    tracemalloc.start()
+    solvePuzzle(sudoku, line, method)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def makeSudoku(options: Dict) -> Sudoku:
+    """ Creates a Sudoku with the options that are constructor arguments and sets the others as attributes. """
+    parameters = inspect.signature(Sudoku).parameters
+    sudoku = Sudoku(**{name: value for name, value in options.items() if name in parameters})
+    for name, value in options.items():
+        if name not in parameters:
+            setattr(sudoku, name, value)
+    return sudoku
+
+
+def compareConfigurations(puzzles: List[str], configurations: List[Tuple[str, Dict]], counters: List[str] = []) -> List[Tuple[int, float, Dict[str, int]]]:
+    """ Solves every puzzle once per configuration: a solve method name and a dict of options for `makeSudoku`.
+        Every solve gets a new Sudoku, so nothing cached by the CSP is shared between configurations.
+        :param counters: names of counter attributes of the CSP to sum over all solves.
+        :return: per configuration the number of puzzles solved, the puzzles solved per second, and the summed counters.
+    """
+    results = [[0, 0.0, {counter: 0 for counter in counters}] for _ in configurations]
+    for line in puzzles:
+        for result, (method, options) in zip(results, configurations):
+            sudoku = makeSudoku(options)
+            ok, seconds = solvePuzzle(sudoku, line, method)
+            result[0] += ok
+            result[1] += seconds
+            for counter in counters:
+                result[2][counter] += getattr(sudoku, counter)
+    return [(solved, solved / seconds, totals) for solved, seconds, totals in results]
+
+
+def benchmarkDomains(puzzles: List[str] = EASY + HARD):
+    """ Compares the solve rate of Python set domains with bitset domains. """
+    print(f"{'method':<22}{'domains':<9}{'solved':>8}{'puzzles/s':>12}")
+    for method in ["solveForwardChecking", "solveAC3"]:
+        results = compareConfigurations(puzzles, [(method, {'bitsetDomains': False}), (method, {'bitsetDomains': True})])
+        for name, (solved, rate, _) in zip(['set', 'bitset'], results):
+            print(f"{method:<22}{name:<9}{solved:>5}/{len(puzzles):<2}{rate:>12.2f}")
+
+
+def benchmarkTrail(puzzles: List[str] = HARD):
+    """ Compares the copying solvers with the trail based solvers, in solve rate and peak memory on the first puzzle. """
+    methods = ["solveForwardChecking", "solveForwardCheckingTrail", "solveAC3", "solveAC3Trail"]
+    results = compareConfigurations(puzzles, [(method, {}) for method in methods])
+    sudoku = Sudoku()
+    print(f"{'method':<27}{'solved':>8}{'puzzles/s':>12}{'peak KiB':>10}")
+    for method, (solved, rate, _) in zip(methods, results):
+        peak = peakMemory(sudoku, puzzles[0], method)
+        print(f"{method:<27}{solved:>5}/{len(puzzles):<2}{rate:>12.2f}{peak / 1024:>10.0f}")
+
+
+def benchmarkArcConsistency(puzzles: List[str] = HARD):
+    """ Compares AC3 with and without residual supports in revisions, support checks and solve rate. """
+    counters = ['revisions', 'supportChecks']
+    print(f"{'method':<15}{'residues':<10}{'solved':>8}{'puzzles/s':>12}{'revisions':>12}{'checks':>12}")
+    for method in ["solveAC3", "solveAC3Trail"]:
+        results = compareConfigurations(puzzles, [(method, {'residues': None}), (method, {})], counters)
+        for name, (solved, rate, totals) in zip(['off', 'on'], results):
+            print(f"{method:<15}{name:<10}{solved:>5}/{len(puzzles):<2}{rate:>12.2f}{totals['revisions']:>12}{totals['supportChecks']:>12}")
+
+
+def benchmarkBruteForce(puzzles: List[str] = EASY):
+    """ Solve rate of brute force as a baseline. LCV is off: on unpruned domains it ranks all values the same. """
+    (solved, rate, _), = compareConfigurations(puzzles, [("solveBruteForce", {'LCV': False})])
+    print(f"{'method':<17}{'solved':>8}{'puzzles/s':>12}")
+    print(f"{'solveBruteForce':<17}{solved:>5}/{len(puzzles):<2}{rate:>12.2f}")
+
+
+def benchmarkAllDifferent(puzzles: List[str] = HARD):
+    """ Compares pairwise propagation with AllDifferent propagation, with and without matching based filtering. """
+    configurations = [{}, {'allDifferent': True}, {'allDifferent': True, 'matchingFilter': True}]
+    names = ['pairwise', 'alldiff', 'alldiff+matching']
+    print(f"{'method':<27}{'constraints':<18}{'solved':>8}{'puzzles/s':>12}{'nodes':>10}")
+    for method in ["solveForwardCheckingTrail", "solveAC3Trail"]:
+        results = compareConfigurations(puzzles, [(method, options) for options in configurations], ['nodes'])
+        for name, (solved, rate, totals) in zip(names, results):
+            print(f"{method:<27}{name:<18}{solved:>5}/{len(puzzles):<2}{rate:>12.2f}{totals['nodes']:>10}")
+
+
+def percentile(values: List[float], p: float) -> float:
+    """ :return: the value below which p percent of the values lie (nearest rank). """
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+
+def benchmarkRestarts(puzzles: List[str] = HARD, seeds: int = 5, method: str = "solveForwardCheckingTrail"):
+    """ Compares MRV with dom/wdeg, with and without Luby restarts, on the median and p99 solve time over several seeds. """
+    configurations = [('MRV', {}), ('dom/wdeg', {'domWdeg': True}), ('dom/wdeg+restarts', {'domWdeg': True, 'restarts': True})]
+    print(f"{'ordering':<20}{'solved':>8}{'median s':>10}{'p99 s':>10}{'max s':>10}")
+    for name, options in configurations:
+        times, solved = [], 0
+        for line in puzzles:
+            for seed in range(seeds):
+                ok, seconds = solvePuzzle(makeSudoku(dict(options, seed=seed)), line, method)
+                solved += ok
+                times.append(seconds)
+        print(f"{name:<20}{solved:>4}/{len(times):<3} {percentile(times, 50):>10.3f}{percentile(times, 99):>10.3f}{max(times):>10.3f}")
+
+
+def benchmarkBackjumping(puzzles: List[str] = HARD):
+    """ Compares chronological backtracking with conflict-directed backjumping and nogoods, in nodes and solve rate. """
+    counters = ['nodes', 'backjumps', 'nogoodHits']
+    print(f"{'method':<27}{'solved':>8}{'puzzles/s':>12}{'nodes':>10}{'backjumps':>11}{'nogood hits':>13}")
+    methods = ["solveForwardCheckingTrail", "solveForwardCheckingCBJ", "solveAC3Trail", "solveAC3CBJ"]
+    results = compareConfigurations(puzzles, [(method, {}) for method in methods], counters)
+    for method, (solved, rate, totals) in zip(methods, results):
+        print(f"{method:<27}{solved:>5}/{len(puzzles):<2}{rate:>12.2f}{totals['nodes']:>10}{totals['backjumps']:>11}{totals['nogoodHits']:>13}")
+
+
+def benchmarkDancingLinks(puzzles: List[str] = EASY + HARD):
+    """ Compares the exact cover solver with the fastest CSP configuration, and checks that they find the same solutions. """
+    configurations = [("solveDancingLinks", {}), ("solveForwardCheckingTrail", {'allDifferent': True})]
+    print(f"{'method':<27}{'solved':>8}{'puzzles/s':>12}")
+    for (method, _), (solved, rate, _) in zip(configurations, compareConfigurations(puzzles, configurations)):
+        print(f"{method:<27}{solved:>5}/{len(puzzles):<2}{rate:>12.2f}")
+    for line in puzzles:
+        oracle, sudoku = Sudoku(), makeSudoku(configurations[1][1])
+        expected = oracle.assignmentToLine(oracle.solveDancingLinks(oracle.parseLine(line)))
+        assert sudoku.assignmentToLine(sudoku.solveForwardCheckingTrail(sudoku.parseLine(line))) == expected, line
+
+
+def benchmarkPortfolio(puzzles: List[str] = HARD):
+    """ Prints the winning configuration of the default portfolio per puzzle. All configurations share the cores,
+        so on a machine with fewer cores than configurations the portfolio time includes their contention. """
+    print(f"{'puzzle':<8}{'seconds':>9}  winner")
+    for i, line in enumerate(puzzles):
+        sudoku = Sudoku()
+        result = solvePortfolio(sudoku, sudoku.parseLine(line))
+        print(f"{i:<8}{result.seconds:>9.3f}  {result.configuration}")
+
+
+def benchmarkMinConflicts(seeds: int = 5, maxSteps: int = 20000):
+    """ Min-conflicts local search on the empty grid, the least constrained Sudoku, and on the EASY puzzles.
+        Prints how many runs found a solution, checked against every constraint, and the median number of conflicting
+        cells left otherwise. Checks first that givens without a solution are never reported as solved. """
+    for line in CONTRADICTORY + [UNSOLVABLE]:
+        sudoku = makeSudoku({'boxSize': 2, 'maxSteps': maxSteps})
+        assert sudoku.solveMinConflicts(sudoku.parseLine(line)) is None and sudoku.conflictsLeft > 0, line
+        assert not sudoku.lastStats.solved, line
+    print(f"{'puzzles':<9}{'solved':>8}{'conflicts':>11}{'steps/s':>10}")
+    for name, puzzles in [('empty', ['.' * 81]), ('EASY', EASY)]:
+        conflictsLeft, solved, steps, seconds = [], 0, 0, 0.0
+        for line in puzzles:
+            for seed in range(seeds):
+                sudoku = makeSudoku({'seed': seed, 'maxSteps': maxSteps})
+                ok, _ = solvePuzzle(sudoku, line, "solveMinConflicts")
+                assert ok == (sudoku.conflictsLeft == 0) == sudoku.lastStats.solved, line
+                solved += ok
+                conflictsLeft.append(sudoku.conflictsLeft)
+                steps += sudoku.lastStats.nodes
+                seconds += sudoku.lastStats.seconds
+        print(f"{name:<9}{solved:>4}/{len(conflictsLeft):<3} {percentile(conflictsLeft, 50):>10}{steps / seconds:>10.0f}")
+
+
+def generatePuzzle(boxSize: int, givens: float, seed: int) -> str:
+    """ Generates a solvable puzzle in the format of `Sudoku::parseLine` for a board with regions of boxSize x boxSize:
+        a pattern solution with shuffled bands, rows, stacks, columns and values, of which a fraction givens of the cells is kept.
+    """
+    rng = random.Random(seed)
+    n = boxSize * boxSize
+
+    def shuffledLines():
+        bands = rng.sample(range(boxSize), boxSize)
+        return [band * boxSize + line for band in bands for line in rng.sample(range(boxSize), boxSize)]
+
+    rows, columns, values = shuffledLines(), shuffledLines(), rng.sample(range(1, n + 1), n)
+    solution = [values[(boxSize * (row % boxSize) + row // boxSize + column) % n] for row in rows for column in columns]
+    kept = set(rng.sample(range(n * n), round(givens * n * n)))
+    return "".join(valueToChar(solution[i]) if i in kept else '.' for i in range(n * n))
+
+
+def generateUniquePuzzle(boxSize: int, seed: int) -> str:
+    """ Generates a puzzle with a unique solution in the format of `Sudoku::parseLine`: starting from a full solution of
+        `generatePuzzle`, the cells are emptied in random order, each one only if the solution stays unique.
+    """
+    rng = random.Random(seed)
+    sudoku = Sudoku(boxSize=boxSize)
+    assignment = sudoku.parseLine(generatePuzzle(boxSize, 1.0, seed))
+    for var in rng.sample(sudoku.variableList, len(sudoku.variableList)):
+        value = assignment.pop(var)
+        if not sudoku.hasUniqueSolution(assignment):
+            assignment[var] = value
+    return sudoku.assignmentToLine(assignment)
+
+
+def benchmarkCounting(puzzles: List[str] = HARD, removed: int = 6, seeds: int = 3):
+    """ Times the uniqueness check of the puzzles, counts the solutions of EASY[0] with its first removed givens emptied,
+        and generates puzzles with a unique solution. Checks first that contradictory givens count no solution.
+    """
+    for line in CONTRADICTORY:
+        sudoku = Sudoku(boxSize=2)
+        initialAssignment = sudoku.parseLine(line)
+        assert sudoku.countSolutions(initialAssignment) == 0 and not sudoku.hasUniqueSolution(initialAssignment), line
+    for line in puzzles:
+        sudoku = Sudoku()
+        start = time.perf_counter()
+        unique = sudoku.hasUniqueSolution(sudoku.parseLine(line))
+        print(f"unique: {unique!s:<6}{time.perf_counter() - start:>8.3f}s{sudoku.nodes:>9} nodes")
+    sudoku = Sudoku()
+    initialAssignment = sudoku.parseLine(EASY[0])
+    for var in [var for var in sudoku.variableList if var in initialAssignment][:removed]:
+        del initialAssignment[var]
+    start = time.perf_counter()
+    count = sudoku.countSolutions(initialAssignment)
+    seconds = time.perf_counter() - start
+    print(f"EASY[0] without {removed} givens: {count} solutions in {seconds:.2f}s ({count / seconds:.0f} solutions/s, {sudoku.nodes} nodes)")
+    for seed in range(seeds):
+        start = time.perf_counter()
+        line = generateUniquePuzzle(3, seed)
+        print(f"{line} {81 - line.count('.')} givens in {time.perf_counter() - start:.2f}s")
+
+
+def benchmarkScaling(sets: List[Tuple[int, float]] = [(3, 0.0), (4, 0.45), (5, 0.55)], puzzles: int = 3, timeout: float = 10.0):
+    """ Shows how every solve mode scales with the board size. Every solve runs in its own process and is stopped after
+        timeout seconds, so instances that need real search can be used: the HARD puzzles for 9x9, and generated puzzles
+        for the larger boards with as few givens as forward checking on the trail still solves in about a second
+        (thousands of backtracks; with more givens there are none, with fewer it rarely finishes). Prints per board size and method the number solved and timed out,
+        and for the solved ones the mean solve time and nodes, and the nodes per second.
+        :param sets: per board (boxSize, fraction of givens); a fraction of 0 means the HARD puzzles.
+    """
+    methods = [("solveBruteForce", {'LCV': False}), ("solveForwardChecking", {}), ("solveAC3", {}),
+               ("solveForwardCheckingTrail", {}), ("solveAC3Trail", {}), ("solveDancingLinks", {})]
+    print(f"{'board':<7}{'method':<27}{'solved':>8}{'timeouts':>10}{'mean s':>9}{'nodes':>10}{'nodes/s':>10}")
+    for boxSize, givens in sets:
+        lines = HARD if givens == 0.0 else [generatePuzzle(boxSize, givens, seed) for seed in range(puzzles)]
+        board = f"{boxSize * boxSize}x{boxSize * boxSize}"
+        for method, options in methods:
+            solved, timeouts, seconds, nodes = 0, 0, 0.0, 0
+            for line in lines:
+                sudoku = makeSudoku(dict(options, boxSize=boxSize))
+                result = solvePortfolio(sudoku, sudoku.parseLine(line), [(method, {})], timeout)
+                if result.configuration is None:
+                    timeouts += 1
+                elif result.assignment is not None and sudoku.isValid(result.assignment):
+                    solved += 1
+                    seconds += result.stats.seconds
+                    nodes += result.stats.nodes
+            mean = f"{seconds / solved:>9.3f}{nodes / solved:>10.0f}{nodes / seconds:>10.0f}" if solved else f"{'-':>9}{'-':>10}{'-':>10}"
+            print(f"{board:<7}{method:<27}{solved:>5}/{len(lines):<2}{timeouts:>10}{mean}")
+
+
+def benchmarkMRVIndex(sets: List[Tuple[int, float, int]] = [(3, 0.0, 20000), (4, 0.4, 5000), (5, 0.45, 2000)], puzzles: int = 3):
+    """ Compares MRV selection from the `DomainSizeIndex` with the linear scan of `CSP::selectVariable`.
+        Both break ties on variableIndex, so they select the same variables and search the same tree, which is checked
+        first on HARD[0]: every search runs up to a node budget with `SearchEngine`, the time per node is then directly
+        comparable.
+        :param sets: per board (boxSize, fraction of givens, node budget); a fraction of 0 means the HARD puzzles.
+    """
+    orders = []
+    for mrvIndex in [True, False]:
+        sudoku = Sudoku()
+        sudoku.mrvIndex = mrvIndex
+        order, selectVariable = [], sudoku.selectVariable
+        sudoku.selectVariable = lambda *args, **kwargs: order.append(selectVariable(*args, **kwargs)) or order[-1]
+        sudoku.searchEngine(sudoku.parseLine(HARD[0])).run()
+        orders.append([sudoku.variableIndex[var] for var in order])
+    assert orders[0] == orders[1], orders
+    print(f"{'board':<7}{'MRV':<7}{'solved':>8}{'nodes':>9}{'seconds':>9}{'nodes/s':>9}")
+    for boxSize, givens, maxNodes in sets:
+        lines = HARD if givens == 0.0 else [generatePuzzle(boxSize, givens, seed) for seed in range(puzzles)]
+        for name, mrvIndex in [('index', True), ('scan', False)]:
+            solved, nodes, seconds = 0, 0, 0.0
+            for line in lines:
+                sudoku = Sudoku(boxSize=boxSize)
+                sudoku.mrvIndex = mrvIndex
+                initialAssignment = sudoku.parseLine(line)
+                start = time.perf_counter()
+                solved += sudoku.searchEngine(initialAssignment).run(maxNodes) is not None
+                seconds += time.perf_counter() - start
+                nodes += sudoku.nodes
+            board = f"{boxSize * boxSize}x{boxSize * boxSize}"
+            print(f"{board:<7}{name:<7}{solved:>5}/{len(lines):<2}{nodes:>9}{seconds:>9.2f}{nodes / seconds:>9.0f}")
+
+
+def benchmarkIterative(puzzles: List[str] = HARD):
+    """ Compares the recursive trail based solvers with the iterative `SearchEngine`, on the HARD puzzles and on the
+        empty 25x25 board, whose search is 625 levels deep. """
+    print(f"{'puzzles':<9}{'method':<31}{'solved':>8}{'puzzles/s':>12}{'nodes':>10}")
+    for name, lines, boxSize in [('HARD', puzzles, 3), ('25x25', ['.' * 625], 5)]:
+        for method in ["solveForwardCheckingTrail", "solveForwardCheckingIterative", "solveAC3Trail", "solveAC3Iterative"]:
+            if name == '25x25' and method.startswith("solveAC3"):
+                continue
+            try:
+                (solved, rate, totals), = compareConfigurations(lines, [(method, {'boxSize': boxSize})], ['nodes'])
+                print(f"{name:<9}{method:<31}{solved:>5}/{len(lines):<2}{rate:>12.2f}{totals['nodes']:>10}")
+            except RecursionError:
+                print(f"{name:<9}{method:<31}{'recursion limit':>30}")
+
+
+def benchmarkParallel(puzzles: List[str] = HARD, workers: List[int] = [1, 2, 4]):
+    """ Solves the puzzles with `solveParallel` for each number of workers. The speed-up needs as many free CPUs. """
+    print(f"{'workers':<9}{'solved':>8}{'seconds':>10}{'speed-up':>10}{'nodes':>10}{'steals':>8}")
+    baseline = None
+    for count in workers:
+        solved, seconds, nodes, steals = 0, 0.0, 0, 0
+        for line in puzzles:
+            sudoku = Sudoku()
+            initialAssignment = sudoku.parseLine(line)
+            result = solveParallel(sudoku, initialAssignment, count)
+            solved += result.assignment is not None and sudoku.isValid(result.assignment)
+            seconds += result.seconds
+            nodes += result.nodes
+            steals += result.steals
+        baseline = baseline if baseline is not None else seconds
+        print(f"{count:<9}{solved:>5}/{len(puzzles):<2}{seconds:>10.2f}{baseline / seconds:>10.2f}{nodes:>10}{steals:>8}")
+
+
+def benchmarkSAC(puzzles: List[str] = HARD, budget: float = 0.2):
+    """ Compares the trail based solvers without preprocessing, with full SAC and with SAC limited to budget seconds,
+        on the puzzles and on generated 16x16 puzzles with half of the cells given. Per puzzle the time is split into
+        the SAC preprocessing and the rest, SAC pays for itself where the total drops below the one without. The values
+        the preprocessing removes are split into those of its initial arc consistency pass and those of the singleton tests.
+    """
+    sets = [('9x9', puzzles, 3), ('16x16', [generatePuzzle(4, 0.5, seed) for seed in range(3)], 4)]
+    methods = ["solveForwardCheckingTrail", "solveAC3Trail"]
+    preprocessing = [('none', {}), ('SAC', {'SAC': True}), (f'SAC {budget}s', {'SAC': True, 'sacBudget': budget})]
+    print(f"{'board':<7}{'method':<27}{'SAC':<10}{'solved':>8}{'mean s':>9}{'SAC s':>8}{'AC pruned':>10}{'SAC pruned':>11}{'nodes':>9}")
+    for board, lines, boxSize in sets:
+        for method in methods:
+            configurations = [(method, dict(options, boxSize=boxSize)) for _, options in preprocessing]
+            results = compareConfigurations(lines, configurations, ['nodes', 'sacSeconds', 'acPruned', 'sacPruned'])
+            for (name, _), (solved, rate, totals) in zip(preprocessing, results):
+                print(f"{board:<7}{method:<27}{name:<10}{solved:>5}/{len(lines):<2}{1 / rate:>9.3f}{totals['sacSeconds'] / len(lines):>8.3f}"
+                      f"{totals['acPruned'] / len(lines):>10.0f}{totals['sacPruned'] / len(lines):>11.0f}{totals['nodes'] / len(lines):>9.0f}")
+
+
+if __name__ == '__main__':
+    benchmarkDomains()
+    benchmarkTrail()
+    benchmarkArcConsistency()
+    benchmarkBruteForce()
+    benchmarkAllDifferent()
+    benchmarkRestarts()
+    benchmarkBackjumping()
+    benchmarkDancingLinks()
+    benchmarkPortfolio()
+    benchmarkMinConflicts()
+    benchmarkScaling()
+    benchmarkMRVIndex()
+    benchmarkIterative()
+    benchmarkParallel()
+    benchmarkCounting()
+    benchmarkSAC()
@@ -1,15 +1,25 @@
 import queue
 import random
 import copy
+import json
+import time
+import functools
 
-from typing import Set, Dict, List, TypeVar, Optional
+from typing import Set, Dict, List, TypeVar, Optional, Iterable, Iterator, Tuple
 from abc import ABC, abstractmethod
+from collections import deque, OrderedDict
+from itertools import combinations
+from collections.abc import MutableMapping, MutableSet
 
 from util import monitor
 
 
 Value = TypeVar('Value')
 
+_NO_RESIDUE = object() # Marks a value that has no residual support yet
+CULPRITS = "culprits" # Kinds of the trail entries that are not domain changes, see `Trail`
+ASSIGNED = "assigned"
+
 
 class Variable(ABC):
     @property
@@ -25,10 +35,140 @@ class Variable(ABC):
         return self
 
 
+class RestartSearch(Exception):
+    """ Raised inside the trail based search when the failure limit of the current restart run is reached. """
+    pass
+
+
+def luby(i: int) -> int:
+    """ Returns the i-th element (starting at 1) of the Luby sequence 1, 1, 2, 1, 1, 2, 4, 1, 1, 2, ... """
+    while True:
+        k = i.bit_length()
+        if i == (1 << k) - 1:
+            return 1 << (k - 1)
+        i -= (1 << (k - 1)) - 1
+
+
+class SolveStats:
+    """ Telemetry of one solve, recorded by `recordTelemetry` from the counters of the CSP. """
+
+    def __init__(self, method: str, solved: bool, seconds: float, propagationSeconds: float, counters: Dict[str, int]):
+        self.method = method
+        self.solved = solved
+        self.nodes = counters['nodes']
+        self.backtracks = counters['backtracks'] # Values that were tried and failed
+        self.maxDepth = counters['maxDepth'] # Most variables assigned at once, besides the initial assignment
+        self.pruned = counters['pruned'] # Values removed by forward checking, arc consistency or AllDifferent propagation
+        self.revisions = counters['revisions']
+        self.supportChecks = counters['supportChecks']
+        self.seconds = seconds
+        self.propagationSeconds = propagationSeconds
+        self.searchSeconds = seconds - propagationSeconds
+
+    def toJson(self) -> str:
+        return json.dumps(self.__dict__)
+
+
+TELEMETRY_COUNTERS = ('nodes', 'backtracks', 'pruned', 'revisions', 'supportChecks')
+
+
+def recordTelemetry(solve=None, solved=None):
+    """ Decorates a solve method of a CSP so that every call stores a `SolveStats` in `CSP::lastStats`
+        and appends it to `CSP::telemetry` if that is a list. The counters are only read before and after the solve,
+        the solvers themselves just increment them.
+        :param solved: function (csp, result) -> whether the result solves the CSP, by default whether it is not None.
+            Use as @recordTelemetry(solved=...) for solve methods that can return an assignment that is no solution.
+    """
+    if solve is None:
+        return functools.partial(recordTelemetry, solved=solved)
+    isSolved = solved if solved is not None else lambda csp, result: result is not None
+
+    @functools.wraps(solve)
+    def solveWithTelemetry(self, initialAssignment=dict()):
+        before = {counter: getattr(self, counter) for counter in TELEMETRY_COUNTERS}
+        propagationSeconds = self.propagationSeconds
+        givens = len(initialAssignment) # Brute force extends the initial assignment in place
+        self.maxDepth = givens
+        start = time.perf_counter()
+        result = solve(self, initialAssignment)
+        seconds = time.perf_counter() - start
+        counters = {counter: getattr(self, counter) - before[counter] for counter in TELEMETRY_COUNTERS}
+        counters['maxDepth'] = self.maxDepth - givens
+        self.lastStats = SolveStats(solve.__name__, isSolved(self, result), seconds, self.propagationSeconds - propagationSeconds, counters)
+        if self.telemetry is not None:
+            self.telemetry.append(self.lastStats)
+        return result
+    return solveWithTelemetry
+
+
+def propagation(propagate):
+    """ Decorates a propagation method of a CSP so that the time spent in it is added to `CSP::propagationSeconds`. """
+    @functools.wraps(propagate)
+    def timedPropagation(self, *args):
+        start = time.perf_counter()
+        try:
+            return propagate(self, *args)
+        finally:
+            self.propagationSeconds += time.perf_counter() - start
+    return timedPropagation
+
+
+def writeJsonLines(stats: Iterable[SolveStats], path: str):
+    """ Appends the stats to a file, one JSON object per line. """
+    with open(path, "a") as file:
+        for record in stats:
+            file.write(record.toJson() + "\n")
+
+
 class CSP(ABC):
-    def __init__(self, MRV=True, LCV=True):
+    def __init__(self, MRV=True, LCV=True, bitsetDomains=False, domWdeg=False, restarts=False, seed=None):
+        """ :param domWdeg: select variables by domain size divided by weighted degree (dom/wdeg) instead of MRV.
+            :param restarts: restart the trail based solvers after a Luby sequence of failure limits.
+            :param seed: seed of the random number generator used for random choices and tie breaking.
+        """
         self.MRV = MRV
         self.LCV = LCV
+        self.bitsetDomains = bitsetDomains
+        self.domWdeg = domWdeg
+        self.restarts = restarts
+        self.random = random.Random(seed)
+        self.weights = {} # (var1, var2) -> weight of the constraint between them, 1 if missing; stored in both directions
+        self.restartBase = 100 # Failures allowed in a restart run are restartBase times the next Luby number
+        self.failures = 0 # Number of values that failed in the current restart run
+        self.failureLimit = None
+        self.residues = {} # (xi, x, xj) -> last support of x in xj found by AC3, None to disable residual supports
+        self.revisions = 0 # Number of arc revisions by AC3
+        self.supportChecks = 0 # Number of constraint checks made by arc revisions
+        self.variableList = None # Set by `CSP::freezeConstraintGraph`
+        self.allDifferentConstraints = [] # Tuples of variables declared with `CSP::addAllDifferent`
+        self.allDifferentOf = {} # variable -> indices of the AllDifferent constraints it is in
+        self.nakedSubsetSize = 3 # Largest naked subset the AllDifferent propagator looks for
+        self.matchingFilter = False # Whether the AllDifferent propagator also does matching based (Régin) filtering
+        self.mrvIndex = True # Whether the trail based solvers select MRV variables from a `DomainSizeIndex` instead of a scan
+        self.nodes = 0 # Number of search nodes visited by the solvers
+        self.nogoodLimit = 1000 # Nogoods kept by the backjumping solvers, the least recently used one is evicted first
+        self.nogoodHits = 0 # Number of assignments rejected by a recorded nogood
+        self.backjumps = 0 # Number of search levels skipped by backjumping
+        self.backtracks = 0 # Number of values that were tried and failed, by all solvers
+        self.pruned = 0 # Number of values removed by propagation
+        self.maxDepth = 0 # Most variables assigned at once during the last solve
+        self.propagationSeconds = 0.0 # Time spent in the methods decorated with `propagation`
+        self.telemetry = None # A list to collect the `SolveStats` of every solve in, None to only keep lastStats
+        self.lastStats = None # `SolveStats` of the last solve
+        self._conflictMasks = {} # (var, value) -> per conflicting neighbor value, the mask of the neighbors it conflicts in
+        self.maxSteps = 100000 # Step budget of `CSP::solveMinConflicts`
+        # The min-conflicts defaults come from a sweep like `Benchmark::benchmarkMinConflicts` (tenure 0-40, walk 0-0.2,
+        # 20000 steps): on Sudoku any tabu tenure solved fewer runs, walks of 0 and 0.02 were alike, larger ones worse
+        self.tabuTenure = 0 # Steps during which min-conflicts doesn't give a variable back the value it just left
+        self.walkProbability = 0.02 # Probability that a min-conflicts step picks a random value instead of the best one
+        self.conflictsLeft = 0 # Number of conflicting variables in the assignment the last min-conflicts solve returned
+        self.SAC = False # Whether the trail based solvers preprocess with `CSP::singletonArcConsistency` before searching
+        self.sacBudget = None # Seconds the SAC preprocessing may take, None for no limit
+        self.singletonTests = 0 # Number of values tentatively assigned and propagated by SAC
+        self.acPruned = 0 # Values removed by the arc consistency pass the last SAC preprocessing starts with
+        self.sacPruned = 0 # Values removed by the singleton tests of the last SAC preprocessing, after that pass
+        self.sacSeconds = 0.0 # Time the last SAC preprocessing took
+        self.sacComplete = False # Whether the last SAC preprocessing reached singleton arc consistency within its budget
 
     @property
     @abstractmethod
@@ -49,6 +189,19 @@ class CSP(ABC):
         """
         pass
 
+    def freezeConstraintGraph(self, variables: Iterable[Variable] = None):
+        """ Builds the constraint graph once, for CSPs whose variables and constraints don't change after construction.
+            Subclasses opt in by calling this at the end of their constructor; afterwards `CSP::neighbors` is served from
+            the cache and the following are available:
+            - variableList: the variables in a fixed order (the given order, if any)
+            - variableIndex: variable -> its position in variableList
+            Subclasses should also return a cached set from `CSP::variables`.
+        """
+        self.variableList = tuple(variables if variables is not None else self.variables)
+        self.variableIndex = {var: i for i, var in enumerate(self.variableList)}
+        neighborSets = {var: frozenset(self.neighbors(var)) for var in self.variableList}
+        self.neighbors = neighborSets.__getitem__
+
     def assignmentToStr(self, assignment: Dict[Variable, Value]) -> str:
         """ Formats the assignment of variables for this CSP into a string. """
         s = ""
@@ -58,9 +211,10 @@ class CSP(ABC):
 
     def isComplete(self, assignment: Dict[Variable, Value]) -> bool:
         """ Return whether the assignment covers all variables.
+            Assignments only hold variables of this CSP, so comparing the sizes is enough and takes no pass over them.
             :param assignment: dict (Variable -> value)
         """
-        return not len(self.remainingVariables(assignment))
+        return len(assignment) == len(self.variables)
 
     @abstractmethod
     def isValidPairwise(self, var1: Variable, val1: Value, var2: Variable, val2: Value) -> bool:
@@ -82,40 +236,79 @@ class CSP(ABC):
                     return False
         return True
 
+    def isConsistent(self, assignment: Dict[Variable, Value], var: Variable) -> bool:
+        """ Return whether the value of var is valid with the values of its already assigned neighbors.
+            If the assignment was valid before var was assigned this is the same as `CSP::isValid`,
+            but only the constraints of var are checked instead of every assigned pair.
+        """
+        value = assignment[var]
+        for neighbor in self.neighbors(var):
+            if neighbor in assignment and not self.isValidPairwise(var, value, neighbor, assignment[neighbor]):
+                return False
+        return True
+
+    def consistentGivens(self, initialAssignment: Dict[Variable, Value]) -> bool:
+        """ Return whether no two values of initialAssignment conflict. The in-place propagators skip assigned
+            neighbors, so the trail based solvers check this before propagating the givens.
+        """
+        return all(self.isConsistent(initialAssignment, var) for var in initialAssignment)
+
+
+    def initialDomains(self, initialAssignment: Dict[Variable, Value]) -> Dict[Variable, Set[Value]]:
+        """ Returns the domains the solvers start from, as `BitsetDomains` if this CSP uses bitset domains. """
+        domains = domainsFromAssignment(initialAssignment, self.variables)
+        if self.bitsetDomains:
+            return BitsetDomains.fromSets(domains)
+        return domains
 
+    @recordTelemetry
     def solveBruteForce(self, initialAssignment: Dict[Variable, Value] = dict()) -> Optional[Dict[Variable, Value]]:
         """ Called to solve this CSP with brute force technique.
             Initializes the domains and calls `CSP::_solveBruteForce`. """
-        domains = domainsFromAssignment(initialAssignment, self.variables)
-        return self._solveBruteForce(initialAssignment, domains)
+        domains = self.initialDomains(initialAssignment)
+        if not self.isValid(initialAssignment):
+            return None
+        return self._solveBruteForce(initialAssignment, domains, set(self.remainingVariables(initialAssignment)))
 
     @monitor
-    def _solveBruteForce(self, assignment: Dict[Variable, Value], domains: Dict[Variable, Set[Value]]) -> Optional[Dict[Variable, Value]]:
+    def _solveBruteForce(self, assignment: Dict[Variable, Value], domains: Dict[Variable, Set[Value]], unassigned: Set[Variable] = None) -> Optional[Dict[Variable, Value]]:
         """ Implement the actual backtracking algorithm to brute force this CSP.
             Use `CSP::isComplete`, `CSP::isValid`, `CSP::selectVariable` and `CSP::orderDomain`.
+            Every new value is only checked against its assigned neighbors with `CSP::isConsistent`,
+            and the set of unassigned variables is updated along with the assignment instead of recomputed.
             :return: a complete and valid assignment if one exists, None otherwise.
         """
-        if self.isComplete(assignment):
+        if unassigned is None:
+            unassigned = set(self.remainingVariables(assignment))
+        self.nodes += 1
+        self.maxDepth = max(self.maxDepth, len(assignment))
+        if not unassigned:
             return assignment
-        var = self.selectVariable(assignment, domains)
+        var = self.selectVariable(assignment, domains, unassigned)
+        unassigned.remove(var)
         for value in self.orderDomain(assignment, domains, var):
             assignment[var] = value
-            if self.isValid(assignment):
-                result = self._solveBruteForce(assignment, domains)
+            if self.isConsistent(assignment, var):
+                result = self._solveBruteForce(assignment, domains, unassigned)
                 if result is not None:
                     return result
             assignment.pop(var)
+            self.backtracks += 1
+        unassigned.add(var)
         return None
 
+    @recordTelemetry
     def solveForwardChecking(self, initialAssignment: Dict[Variable, Value] = dict()) -> Optional[Dict[Variable, Value]]:
         """ Called to solve this CSP with forward checking.
             Initializes the domains and calls `CSP::_solveForwardChecking`. """
-        domains = domainsFromAssignment(initialAssignment, self.variables)
+        domains = self.initialDomains(initialAssignment)
         for var in set(initialAssignment.keys()):
             domains = self.forwardChecking(initialAssignment, domains, var)
         return self._solveForwardChecking(initialAssignment, domains)
 
     def checkEmptyDomain(self, domains: Dict[Variable, Set[Value]]):
+        if isinstance(domains, BitsetDomains):
+            return domains.hasEmptyDomain()
         for domain in domains:
             if len(domains[domain]) == 0:
                 return True
@@ -128,6 +321,8 @@ class CSP(ABC):
             Use `CSP::forwardChecking` and you should no longer need to check if an assignment is valid.
             :return: a complete and valid assignment if one exists, None otherwise.
         """
+        self.nodes += 1
+        self.maxDepth = max(self.maxDepth, len(assignment))
         if self.isComplete(assignment):
             return assignment
         var = self.selectVariable(assignment, domains)
@@ -135,13 +330,14 @@ class CSP(ABC):
             newAssignment = copy.deepcopy(assignment)
             newAssignment[var] = value
             newDomains = self.forwardChecking(newAssignment, domains, var)
-            if self.checkEmptyDomain(newDomains):
-                continue
-            result = self._solveForwardChecking(newAssignment, newDomains)
-            if result is not None:
-                return result
+            if not self.checkEmptyDomain(newDomains):
+                result = self._solveForwardChecking(newAssignment, newDomains)
+                if result is not None:
+                    return result
+            self.backtracks += 1
         return None
 
+    @propagation
     def forwardChecking(self, assignment: Dict[Variable, Value], domains: Dict[Variable, Set[Value]], variable: Variable) -> Dict[Variable, Set[Value]]:
         """ Implement the forward checking algorithm from the theory lectures.
 
@@ -150,29 +346,88 @@ class CSP(ABC):
         :param variable: The variable that was just assigned (only need to check changes).
         :return: the new domains after enforcing all constraints.
         """
+        if isinstance(domains, BitsetDomains):
+            return self._forwardCheckingBitset(assignment, domains, variable)
         forwardDomains = copy.deepcopy(domains)
         for neighbor in self.neighbors(variable):
             for value in domains[neighbor]:
                 if not self.isValidPairwise(variable, assignment[variable], neighbor, value):
                     forwardDomains[neighbor].remove(value)
+                    self.pruned += 1
         return forwardDomains
 
-    def selectVariable(self, assignment: Dict[Variable, Value], domains: Dict[Variable, Set[Value]]) -> Variable:
-        """ Implement a strategy to select the next variable to assign. """
+    def _forwardCheckingBitset(self, assignment: Dict[Variable, Value], domains: 'BitsetDomains', variable: Variable) -> 'BitsetDomains':
+        """ `CSP::forwardChecking` working on the bitmasks directly. """
+        forwardDomains = domains.copy()
+        value = assignment[variable]
+        for neighbor in self.neighbors(variable):
+            mask = domains.masks[neighbor]
+            for neighborValue in domains.decode(mask):
+                if not self.isValidPairwise(variable, value, neighbor, neighborValue):
+                    mask &= ~domains.bits[neighborValue]
+                    self.pruned += 1
+            forwardDomains.setMask(neighbor, mask)
+        return forwardDomains
+
+    def selectVariable(self, assignment: Dict[Variable, Value], domains: Dict[Variable, Set[Value]], unassigned: Set[Variable] = None, index: 'DomainSizeIndex' = None) -> Variable:
+        """ Implement a strategy to select the next variable to assign.
+            :param unassigned: the variables not yet assigned if the caller keeps track of them, computed otherwise.
+            :param index: MRV index kept up to date with the domains, used by the trail based solvers instead of a scan.
+        """
+        if index is not None:
+            return index.select()
+        if unassigned is None:
+            unassigned = self.remainingVariables(assignment)
+        if self.domWdeg:
+            return self.selectVariableDomWdeg(assignment, domains, unassigned)
         if not self.MRV:
-            return random.choice(list(self.remainingVariables(assignment)))
+            return self.random.choice(list(unassigned))
 
-        variables = list(self.remainingVariables(assignment))
+        if self.variableList is not None: # Break ties in a fixed order
+            variables = [var for var in self.variableList if var in unassigned]
+        else:
+            variables = list(unassigned)
         fewestRemainingValues = variables[0]
         for var in variables[1:]:
             if len(domains[var]) < len(domains[fewestRemainingValues]):
                 fewestRemainingValues = var
         return fewestRemainingValues
 
-    def orderDomain(self, assignment: Dict[Variable, Value], domains: Dict[Variable, Set[Value]], var: Variable) -> List[Value]:
-        """ Implement a smart ordering of the domain values. """
+    def selectVariableDomWdeg(self, assignment: Dict[Variable, Value], domains: Dict[Variable, Set[Value]], unassigned: Set[Variable]) -> Variable:
+        """ Selects the variable with the smallest domain size divided by its weighted degree: the summed weights of the
+            constraints with its unassigned neighbors. Weights grow every time a constraint wipes out a domain, so the
+            search focuses on the variables involved in failures. Ties are broken at random.
+        """
+        best, bestScore = [], None
+        for var in unassigned:
+            weightedDegree = 0
+            for neighbor in self.neighbors(var):
+                if neighbor not in assignment:
+                    weightedDegree += self.weights.get((var, neighbor), 1)
+            score = len(domains[var]) / max(weightedDegree, 1)
+            if bestScore is None or score < bestScore:
+                best, bestScore = [var], score
+            elif score == bestScore:
+                best.append(var)
+        if self.variableList is not None: # Make the random choice independent of set order
+            best.sort(key=self.variableIndex.__getitem__)
+        return self.random.choice(best)
+
+    def increaseWeight(self, var1: Variable, var2: Variable):
+        """ Increases the weight of the constraint between var1 and var2 after it wiped out a domain. """
+        weight = self.weights.get((var1, var2), 1) + 1
+        self.weights[(var1, var2)] = weight
+        self.weights[(var2, var1)] = weight
+
+    def orderDomain(self, assignment: Dict[Variable, Value], domains: Dict[Variable, Set[Value]], var: Variable, counts: 'ConflictCounts' = None) -> List[Value]:
+        """ Implement a smart ordering of the domain values.
+            :param counts: conflict counts kept up to date with the domains, used by the trail based solvers instead of
+                           counting the conflicting neighbor values here.
+        """
         if not self.LCV:
             return list(domains[var])
+        if counts is not None:
+            return sorted(domains[var], key=lambda value: counts.count(var, value))
 
         valuedict = {}
         for value in domains[var]:
@@ -183,10 +438,31 @@ class CSP(ABC):
             valuedict[value] = count
         return [item[0] for item in sorted(valuedict.items(), key=lambda x: x[1])]
 
+    def conflictingValues(self, var: Variable, value: Value, neighbor: Variable) -> Iterable[Value]:
+        """ Returns the values of neighbor that conflict with var = value.
+            Subclasses can override this with a direct answer, by default every value of the start domain is checked.
+        """
+        return [neighborValue for neighborValue in neighbor.startDomain if not self.isValidPairwise(var, value, neighbor, neighborValue)]
+
+    def conflictMasks(self, var: Variable, value: Value) -> Tuple[Tuple[Value, int], ...]:
+        """ Returns the (neighbor value, mask) pairs with for every value of a neighbor that conflicts with var = value
+            the bitmask (over variableIndex) of the neighbors it conflicts in. Computed once per CSP.
+            Needs `CSP::freezeConstraintGraph`.
+        """
+        masks = self._conflictMasks.get((var, value))
+        if masks is None:
+            grouped = {}
+            for neighbor in self.neighbors(var):
+                for neighborValue in self.conflictingValues(var, value, neighbor):
+                    grouped[neighborValue] = grouped.get(neighborValue, 0) | 1 << self.variableIndex[neighbor]
+            masks = self._conflictMasks[(var, value)] = tuple(grouped.items())
+        return masks
+
+    @recordTelemetry
     def solveAC3(self, initialAssignment: Dict[Variable, Value] = dict()) -> Optional[Dict[Variable, Value]]:
         """ Called to solve this CSP with AC3.
             Initializes domains and calls `CSP::_solveAC3`. """
-        domains = domainsFromAssignment(initialAssignment, self.variables)
+        domains = self.initialDomains(initialAssignment)
         for var in set(initialAssignment.keys()):
             domains = self.ac3(initialAssignment, domains, var)
         return self._solveAC3(initialAssignment, domains)
@@ -198,6 +474,8 @@ class CSP(ABC):
             Use `CSP::ac3`.
             :return: a complete and valid assignment if one exists, None otherwise.
         """
+        self.nodes += 1
+        self.maxDepth = max(self.maxDepth, len(assignment))
         if self.isComplete(assignment):
             return assignment
         var = self.selectVariable(assignment, domains)
@@ -205,14 +483,15 @@ class CSP(ABC):
             newAssignment = copy.deepcopy(assignment)
             newAssignment[var] = value
             newDomains = self.ac3(newAssignment, domains, var)
-            if self.checkEmptyDomain(newDomains):
-                continue
-            result = self._solveAC3(newAssignment, newDomains)
-            if result is not None:
-                return result
+            if not self.checkEmptyDomain(newDomains):
+                result = self._solveAC3(newAssignment, newDomains)
+                if result is not None:
+                    return result
+            self.backtracks += 1
         return None
 
 
+    @propagation
     def ac3(self, assignment: Dict[Variable, Value], domains: Dict[Variable, Set[Value]], variable: Variable) -> Dict[Variable, Set[Value]]:
         """ Implement the AC3 algorithm from the theory lectures.
 
@@ -223,30 +502,596 @@ class CSP(ABC):
         """
         newDomains = copy.deepcopy(domains)
         newDomains[variable] = {assignment[variable]}
-        queue = []
-        for var in self.neighbors(variable):
-            queue.append((var, variable))
+        self.propagateArcs(newDomains, [(var, variable) for var in self.neighbors(variable)])
+        return newDomains
 
-        while len(queue) > 0:
-            (xi,xj) = queue.pop(0)
-            if self.removeInconsistentValues(newDomains, xi, xj):
+    def propagateArcs(self, domains: Dict[Variable, Set[Value]], arcs: Iterable[Tuple[Variable, Variable]], trail: 'Trail' = None) -> bool:
+        """ The AC3 worklist: revises arcs until no domain changes anymore, starting from the given arcs.
+            The worklist is a deque and an arc that is already waiting in it is not added a second time.
+            If a trail is given the removals are recorded on it.
+            :return: False as soon as a domain becomes empty, True otherwise.
+        """
+        queue = deque(arcs)
+        queued = set(queue)
+        while queue:
+            arc = queue.popleft()
+            queued.remove(arc)
+            (xi, xj) = arc
+            if trail is not None:
+                trail.explainBy((xj,))
+            if self.removeInconsistentValues(domains, xi, xj, trail):
+                if not domains[xi]:
+                    if self.domWdeg:
+                        self.increaseWeight(xi, xj)
+                    return False
                 for xk in self.neighbors(xi):
-                    queue.append((xk,xi))
-        return newDomains
+                    if xk is not xj and (xk, xi) not in queued:
+                        queued.add((xk, xi))
+                        queue.append((xk, xi))
+        return True
 
-    def removeInconsistentValues(self, domains: Dict[Variable, Set[Value]], xi, xj):
+    def removeInconsistentValues(self, domains: Dict[Variable, Set[Value]], xi, xj, trail: 'Trail' = None):
+        """ Revises the arc (xi, xj): removes the values of xi without support in xj.
+            The support found for a value is kept as its residue (AC-2001) and checked first in later revisions,
+            as long as it is still in the domain of xj the value needs no other support checks.
+            If a trail is given the removals are recorded on it.
+        """
+        self.revisions += 1
+        if isinstance(domains, BitsetDomains):
+            return self._removeInconsistentValuesBitset(domains, xi, xj, trail)
+        residues = self.residues
         removed = False
         for x in domains[xi].copy():
+            if residues is not None and residues.get((xi, x, xj), _NO_RESIDUE) in domains[xj]:
+                continue
             satisfied = False
             for y in domains[xj]:
+                self.supportChecks += 1
                 if self.isValidPairwise(xi, x, xj, y):
                     satisfied = True
+                    if residues is not None:
+                        residues[(xi, x, xj)] = y
+                        residues[(xj, y, xi)] = x
                     break
             if not satisfied:
-                domains[xi].remove(x)
+                if trail is not None:
+                    trail.remove(xi, x)
+                else:
+                    domains[xi].remove(x)
+                self.pruned += 1
                 removed = True
         return removed
 
+    def _removeInconsistentValuesBitset(self, domains: 'BitsetDomains', xi, xj, trail: 'Trail' = None):
+        """ `CSP::removeInconsistentValues` working on the bitmasks directly. """
+        residues = self.residues
+        bits = domains.bits
+        mask = domains.masks[xi]
+        maskj = domains.masks[xj]
+        supports = None
+        for x in domains.decode(mask):
+            if residues is not None and bits.get(residues.get((xi, x, xj), _NO_RESIDUE), 0) & maskj:
+                continue
+            if supports is None:
+                supports = domains.decode(maskj)
+            for y in supports:
+                self.supportChecks += 1
+                if self.isValidPairwise(xi, x, xj, y):
+                    if residues is not None:
+                        residues[(xi, x, xj)] = y
+                        residues[(xj, y, xi)] = x
+                    break
+            else:
+                mask &= ~bits[x]
+        if mask == domains.masks[xi]:
+            return False
+        self.pruned += (domains.masks[xi] & ~mask).bit_count()
+        if trail is not None:
+            trail.setMask(xi, mask)
+        else:
+            domains.setMask(xi, mask)
+        return True
+
+    @recordTelemetry
+    def solveForwardCheckingTrail(self, initialAssignment: Dict[Variable, Value] = dict()) -> Optional[Dict[Variable, Value]]:
+        """ Called to solve this CSP with forward checking on reversible domains.
+            Like `CSP::solveForwardChecking`, but nothing is copied per node: removed values are recorded on a `Trail`
+            and restored when the search backtracks. """
+        return self._solveWithTrail(initialAssignment, self.forwardCheckingInPlace)
+
+    @recordTelemetry
+    def solveAC3Trail(self, initialAssignment: Dict[Variable, Value] = dict()) -> Optional[Dict[Variable, Value]]:
+        """ Called to solve this CSP with AC3 on reversible domains.
+            Like `CSP::solveAC3`, but nothing is copied per node: removed values are recorded on a `Trail`
+            and restored when the search backtracks. """
+        return self._solveWithTrail(initialAssignment, self.ac3InPlace)
+
+    def newTrail(self, domains: Dict[Variable, Set[Value]], explain: bool = False) -> 'Trail':
+        """ Creates the trail for a search on these domains, with the incremental structures this CSP can use:
+            `ConflictCounts` for LCV and a `DomainSizeIndex` for MRV, if the constraint graph is frozen.
+        """
+        frozen = self.variableList is not None
+        counts = ConflictCounts(self, domains) if self.LCV and frozen else None
+        mrv = DomainSizeIndex(self, domains) if self.MRV and self.mrvIndex and not self.domWdeg and frozen else None
+        return Trail(domains, explain=explain, counts=counts, mrv=mrv)
+
+    def _solveWithTrail(self, initialAssignment: Dict[Variable, Value], propagate) -> Optional[Dict[Variable, Value]]:
+        """ Initializes the domains and the trail, propagates the initial assignment and calls `CSP::_solveTrail`. """
+        if not self.consistentGivens(initialAssignment):
+            return None
+        assignment = dict(initialAssignment)
+        trail = self.newTrail(self.initialDomains(assignment))
+        if self.allDifferentConstraints:
+            propagate = self._withAllDifferent(propagate)
+        self.weights = {}
+        for var in initialAssignment:
+            if not propagate(assignment, trail, var):
+                return None
+        if self.SAC and not self.singletonArcConsistency(assignment, trail):
+            return None
+        if not self.restarts:
+            self.failureLimit = None
+            return self._solveTrail(assignment, trail, propagate)
+        mark = trail.mark()
+        run = 1
+        while True:
+            self.failures, self.failureLimit = 0, self.restartBase * luby(run)
+            try:
+                return self._solveTrail(dict(assignment), trail, propagate)
+            except RestartSearch:
+                trail.undo(mark)
+                run += 1
+
+    @monitor
+    def _solveTrail(self, assignment: Dict[Variable, Value], trail: 'Trail', propagate) -> Optional[Dict[Variable, Value]]:
+        """ Backtracking on reversible domains: assigns in place and undoes the trail back to its mark when a value fails.
+            :param propagate: `CSP::forwardCheckingInPlace` or `CSP::ac3InPlace`.
+            :return: a complete and valid assignment if one exists, None otherwise.
+        """
+        self.nodes += 1
+        self.maxDepth = max(self.maxDepth, len(assignment))
+        if self.isComplete(assignment):
+            return assignment
+        var = self.selectVariable(assignment, trail.domains, index=trail.mrv)
+        for value in self.orderDomain(assignment, trail.domains, var, trail.counts):
+            mark = trail.mark()
+            assignment[var] = value
+            if propagate(assignment, trail, var):
+                result = self._solveTrail(assignment, trail, propagate)
+                if result is not None:
+                    return result
+            trail.undo(mark)
+            del assignment[var]
+            self.backtracks += 1
+            self.failures += 1
+            if self.failureLimit is not None and self.failures > self.failureLimit:
+                raise RestartSearch()
+        return None
+
+    @recordTelemetry
+    def solveForwardCheckingIterative(self, initialAssignment: Dict[Variable, Value] = dict()) -> Optional[Dict[Variable, Value]]:
+        """ Called to solve this CSP with forward checking on reversible domains, without recursion (see `SearchEngine`). """
+        return self.searchEngine(initialAssignment, self.forwardCheckingInPlace).run()
+
+    @recordTelemetry
+    def solveAC3Iterative(self, initialAssignment: Dict[Variable, Value] = dict()) -> Optional[Dict[Variable, Value]]:
+        """ Called to solve this CSP with AC3 on reversible domains, without recursion (see `SearchEngine`). """
+        return self.searchEngine(initialAssignment, self.ac3InPlace).run()
+
+    def searchEngine(self, initialAssignment: Dict[Variable, Value] = dict(), propagate=None) -> 'SearchEngine':
+        """ Returns a resumable search for this CSP, see `SearchEngine`.
+            :param propagate: `CSP::forwardCheckingInPlace` (the default) or `CSP::ac3InPlace`.
+        """
+        return SearchEngine(self, initialAssignment, propagate if propagate is not None else self.forwardCheckingInPlace)
+
+    def iterSolutions(self, initialAssignment: Dict[Variable, Value] = dict(), propagate=None) -> Iterator[Dict[Variable, Value]]:
+        """ Generates every solution extending initialAssignment, lazily and each exactly once.
+            One `SearchEngine` continues after every solution, so the propagated domains are kept instead of being
+            recomputed from the givens. Restarts are turned off, they would visit solutions again.
+            :param propagate: `CSP::forwardCheckingInPlace` (the default) or `CSP::ac3InPlace`.
+        """
+        engine = self.searchEngine(initialAssignment, propagate)
+        self.failureLimit = None
+        while True:
+            solution = engine.run()
+            if solution is None:
+                return
+            yield dict(solution)
+
+    def countSolutions(self, initialAssignment: Dict[Variable, Value] = dict(), limit: int = None, propagate=None) -> int:
+        """ Counts the solutions extending initialAssignment, stopping at limit if given. """
+        count = 0
+        for _ in self.iterSolutions(initialAssignment, propagate):
+            count += 1
+            if count == limit:
+                break
+        return count
+
+    def hasUniqueSolution(self, initialAssignment: Dict[Variable, Value] = dict()) -> bool:
+        """ Whether exactly one solution extends initialAssignment, the search stops at the second one. """
+        return self.countSolutions(initialAssignment, limit=2) == 1
+
+    @recordTelemetry
+    def solveForwardCheckingCBJ(self, initialAssignment: Dict[Variable, Value] = dict()) -> Optional[Dict[Variable, Value]]:
+        """ Called to solve this CSP with forward checking and conflict-directed backjumping (FC-CBJ). """
+        return self._solveWithBackjumping(initialAssignment, self.forwardCheckingInPlace)
+
+    @recordTelemetry
+    def solveAC3CBJ(self, initialAssignment: Dict[Variable, Value] = dict()) -> Optional[Dict[Variable, Value]]:
+        """ Called to solve this CSP with AC3 and conflict-directed backjumping (MAC-CBJ). """
+        return self._solveWithBackjumping(initialAssignment, self.ac3InPlace)
+
+    def _solveWithBackjumping(self, initialAssignment: Dict[Variable, Value], propagate) -> Optional[Dict[Variable, Value]]:
+        """ Like `CSP::_solveWithTrail`, but the trail also explains every removal (see `Trail`) and the search is
+            `CSP::_solveBackjumping`. Restarts are not used here, the nogoods are only kept for one solve.
+        """
+        if not self.consistentGivens(initialAssignment):
+            return None
+        assignment = dict(initialAssignment)
+        trail = self.newTrail(self.initialDomains(assignment), explain=True)
+        if self.allDifferentConstraints:
+            propagate = self._withAllDifferent(propagate)
+        self.weights = {}
+        for var in initialAssignment:
+            if not propagate(assignment, trail, var):
+                return None
+        return self._solveBackjumping(assignment, trail, propagate, {}, NogoodStore(self.nogoodLimit))[0]
+
+    @monitor
+    def _solveBackjumping(self, assignment: Dict[Variable, Value], trail: 'Trail', propagate, depth: Dict[Variable, int], nogoods: 'NogoodStore') -> Tuple[Optional[Dict[Variable, Value]], Set[Variable]]:
+        """ Backtracking on reversible domains with conflict-directed backjumping.
+            The conflict set of a variable collects the earlier decisions that explain why its values failed: the culprits
+            of its own domain, of the domain that became empty, or the conflict set returned by the search below.
+            When all values failed and the conflict set does not contain the variable of the level above,
+            that level is skipped without trying its other values, up to the deepest variable in the conflict set.
+            The failed combination of values of the conflict set is recorded as a nogood.
+            :param depth: decision variable -> its depth, the variables of the initial assignment are not in it.
+            :return: a complete and valid assignment or None, and the conflict set if None.
+        """
+        self.nodes += 1
+        self.maxDepth = max(self.maxDepth, len(assignment))
+        if self.isComplete(assignment):
+            return assignment, set()
+        var = self.selectVariable(assignment, trail.domains, index=trail.mrv)
+        conflict = {other for other in trail.culprits[var] if other in depth} # The values already pruned failed too
+        depth[var] = len(depth)
+        for value in self.orderDomain(assignment, trail.domains, var, trail.counts):
+            mark = trail.mark()
+            assignment[var] = value
+            nogood = nogoods.find(assignment, var, value)
+            if nogood is not None:
+                self.nogoodHits += 1
+                failure = {other for other, _ in nogood}
+            elif not propagate(assignment, trail, var):
+                failure = {other for other in trail.conflict if other in depth}
+            else:
+                result, failure = self._solveBackjumping(assignment, trail, propagate, depth, nogoods)
+                if result is not None:
+                    return result, failure
+                if var not in failure:
+                    # The failure below doesn't depend on this variable, so neither would its other values
+                    self.backjumps += 1
+                    self.backtracks += 1
+                    trail.undo(mark)
+                    del assignment[var]
+                    del depth[var]
+                    return None, failure
+            conflict |= failure
+            conflict.discard(var)
+            trail.undo(mark)
+            del assignment[var]
+            self.backtracks += 1
+        del depth[var]
+        nogoods.add(frozenset((other, assignment[other]) for other in conflict))
+        return None, conflict
+
+    @recordTelemetry(solved=lambda csp, result: result is not None and csp.conflictsLeft == 0)
+    def solveMinConflicts(self, initialAssignment: Dict[Variable, Value] = dict()) -> Dict[Variable, Value]:
+        """ Called to solve this CSP with min-conflicts local search instead of backtracking.
+            Starts from a greedy complete assignment and repeatedly gives a random conflicting variable the value with the
+            fewest conflicts. The variables of the initial assignment are never changed.
+            - conflict counts: per variable and value the number of conflicting neighbor values, updated with
+              `CSP::conflictingValues` when a neighbor changes instead of recounted
+            - tabu: a variable doesn't get back the value it left for tabuTenure steps, unless that beats the best so far
+            - random walk: with walkProbability the variable gets a random value
+            At most maxSteps steps are made, every step counts as a node.
+            The values that conflict with the initial assignment are left out of the domains, so only conflicts between
+            free variables are counted.
+            :return: None if the initial assignment conflicts or leaves a variable no value (conflictsLeft is then the
+                     number of such variables, at least 1), otherwise a complete assignment, valid if a solution was found,
+                     otherwise the one with the fewest conflicting variables seen (their number is left in conflictsLeft).
+        """
+        assignment = dict(initialAssignment)
+        variables = self.variableList if self.variableList is not None else list(self.variables)
+        free = [var for var in variables if var not in initialAssignment]
+        domains = {}
+        for var in free:
+            domains[var] = [value for value in var.startDomain
+                            if all(self.isValidPairwise(var, value, neighbor, initialAssignment[neighbor]) for neighbor in self.neighbors(var) if neighbor in initialAssignment)]
+        wipedOut = sum(not domains[var] for var in free)
+        if wipedOut or not self.consistentGivens(initialAssignment):
+            self.conflictsLeft = max(wipedOut, 1)
+            return None
+        conflicts = {var: dict.fromkeys(domains[var], 0) for var in free} # var -> value -> number of conflicting neighbors
+
+        def change(var, old, new):
+            """ Updates the conflict counts of the free neighbors when var goes from old to new (None if unassigned). """
+            for neighbor in self.neighbors(var):
+                counts = conflicts.get(neighbor)
+                if counts is None:
+                    continue
+                if old is not None:
+                    for value in self.conflictingValues(var, old, neighbor):
+                        if value in counts:
+                            counts[value] -= 1
+                for value in self.conflictingValues(var, new, neighbor):
+                    if value in counts:
+                        counts[value] += 1
+
+        # Greedy start: every free variable gets the value with the fewest conflicts with the ones before it
+        for var in free:
+            counts = conflicts[var]
+            fewest = min(counts.values())
+            value = self.random.choice([value for value in domains[var] if counts[value] == fewest])
+            assignment[var] = value
+            change(var, None, value)
+
+        conflicted = [var for var in free if conflicts[var][assignment[var]] > 0]
+        position = {var: i for i, var in enumerate(conflicted)} # var -> its index in conflicted, for O(1) removal
+
+        def update(var):
+            """ Puts var in or takes it out of the conflicted variables after its conflict count changed. """
+            inConflict = conflicts[var][assignment[var]] > 0
+            if inConflict and var not in position:
+                position[var] = len(conflicted)
+                conflicted.append(var)
+            elif not inConflict and var in position:
+                i = position.pop(var)
+                last = conflicted.pop()
+                if last is not var:
+                    conflicted[i] = last
+                    position[last] = i
+
+        bestConflicts = len(conflicted)
+        sinceBest = [] # (var, old value) of the moves since the best assignment, to return to it without copying each one
+        tabu = {} # (var, value) -> first step at which the value may be given back to var
+        for step in range(self.maxSteps):
+            if not conflicted:
+                break
+            self.nodes += 1
+            var = self.random.choice(conflicted)
+            old = assignment[var]
+            counts = conflicts[var]
+            if self.random.random() < self.walkProbability:
+                new = self.random.choice(domains[var])
+            else:
+                candidates, fewest = [], None
+                for value in domains[var]:
+                    if value == old:
+                        continue
+                    # Aspiration: a tabu value is allowed if it would beat the best assignment
+                    if tabu.get((var, value), 0) > step and len(conflicted) - 1 >= bestConflicts:
+                        continue
+                    if fewest is None or counts[value] < fewest:
+                        candidates, fewest = [value], counts[value]
+                    elif counts[value] == fewest:
+                        candidates.append(value)
+                if not candidates:
+                    continue
+                new = self.random.choice(candidates)
+            if new == old:
+                continue
+            tabu[(var, old)] = step + self.tabuTenure
+            sinceBest.append((var, old))
+            assignment[var] = new
+            change(var, old, new)
+            update(var)
+            for neighbor in self.neighbors(var):
+                if neighbor in conflicts:
+                    update(neighbor)
+            if len(conflicted) < bestConflicts:
+                bestConflicts = len(conflicted)
+                sinceBest.clear()
+        for var, old in reversed(sinceBest):
+            assignment[var] = old
+        self.conflictsLeft = bestConflicts
+        return assignment
+
+    @propagation
+    def forwardCheckingInPlace(self, assignment: Dict[Variable, Value], trail: 'Trail', variable: Variable) -> bool:
+        """ Forward checking that removes the values through the trail instead of returning new domains.
+            The domain of the assigned variable is reduced to its value.
+            :return: False if the domain of a neighbor became empty.
+        """
+        domains = trail.domains
+        value = assignment[variable]
+        trail.assign(variable, value)
+        for neighbor in self.neighbors(variable):
+            if neighbor in assignment:
+                continue
+            if trail.bitset:
+                mask = domains.masks[neighbor]
+                for neighborValue in domains.decode(mask):
+                    if not self.isValidPairwise(variable, value, neighbor, neighborValue):
+                        mask &= ~domains.bits[neighborValue]
+                        self.pruned += 1
+                if mask != domains.masks[neighbor]:
+                    trail.setMask(neighbor, mask)
+            else:
+                for neighborValue in list(domains[neighbor]):
+                    if not self.isValidPairwise(variable, value, neighbor, neighborValue):
+                        trail.remove(neighbor, neighborValue)
+                        self.pruned += 1
+            if not domains[neighbor]:
+                if self.domWdeg:
+                    self.increaseWeight(variable, neighbor)
+                return False
+        return True
+
+    @propagation
+    def ac3InPlace(self, assignment: Dict[Variable, Value], trail: 'Trail', variable: Variable) -> bool:
+        """ AC3 that removes the values through the trail instead of returning new domains.
+            :return: False if a domain became empty.
+        """
+        trail.assign(variable, assignment[variable])
+        return self.propagateArcs(trail.domains, [(var, variable) for var in self.neighbors(variable)], trail)
+
+    def singletonArcConsistency(self, assignment: Dict[Variable, Value], trail: 'Trail') -> bool:
+        """ Preprocessing that makes the domains arc consistent and then singleton arc consistent (SAC-1): every value of
+            every unassigned variable is assigned tentatively and propagated with `CSP::ac3InPlace` (and the AllDifferent
+            constraints), a value for which that fails is removed and the removal is propagated with AC3. The variables
+            are tested again until no value is removed anymore, or until sacBudget seconds have passed; the domains are
+            then not fully SAC but nothing was removed that belongs to a solution.
+            The removals are made through the trail. Sets acPruned and sacPruned, the values removed by the initial
+            arc consistency and by the singleton tests after it, sacSeconds and sacComplete.
+            :return: False if a domain became empty, the CSP has no solution then.
+        """
+        start = time.perf_counter()
+        deadline = None if self.sacBudget is None else start + self.sacBudget
+        domains = trail.domains
+        variables = [var for var in (self.variableList if self.variableList is not None else self.variables) if var not in assignment]
+        propagate = self._withAllDifferent(self.ac3InPlace) if self.allDifferentConstraints else self.ac3InPlace
+        size = sum(len(domains[var]) for var in variables)
+        self.acPruned = 0
+        self.sacComplete = False
+        try:
+            consistent = self.propagateArcs(domains, [(xi, xj) for xi in variables for xj in self.neighbors(xi)], trail)
+            self.acPruned = size - sum(len(domains[var]) for var in variables)
+            size -= self.acPruned
+            if not consistent:
+                return False
+            changed = True
+            while changed:
+                changed = False
+                for var in variables:
+                    for value in list(domains[var]):
+                        if deadline is not None and time.perf_counter() > deadline:
+                            return True
+                        mark = trail.mark()
+                        assignment[var] = value
+                        consistent = propagate(assignment, trail, var)
+                        trail.undo(mark)
+                        del assignment[var]
+                        self.singletonTests += 1
+                        if not consistent:
+                            trail.remove(var, value)
+                            self.pruned += 1
+                            changed = True
+                            if not domains[var] or not self.propagateArcs(domains, [(xk, var) for xk in self.neighbors(var)], trail):
+                                return False
+            self.sacComplete = True
+            return True
+        finally:
+            self.sacPruned = size - sum(len(domains[var]) for var in variables)
+            self.sacSeconds = time.perf_counter() - start
+
+    def addAllDifferent(self, variables: Iterable[Variable]):
+        """ Declares an AllDifferent constraint: the given variables must all take different values.
+            The trail based solvers propagate it with `CSP::propagateAllDifferent` after every assignment.
+            `CSP::isValidPairwise` must still express the constraint pairwise, the other solvers only use that.
+        """
+        constraint = tuple(variables)
+        for var in constraint:
+            self.allDifferentOf.setdefault(var, []).append(len(self.allDifferentConstraints))
+        self.allDifferentConstraints.append(constraint)
+
+    def _withAllDifferent(self, propagate):
+        """ Wraps a propagation function of the trail based solvers so that the AllDifferent constraints of
+            every variable it changed are propagated afterwards. """
+        def propagateWithAllDifferent(assignment: Dict[Variable, Value], trail: 'Trail', variable: Variable) -> bool:
+            mark = trail.mark()
+            if not propagate(assignment, trail, variable):
+                return False
+            changed = {entry[0] for entry in trail.entries[mark:]}
+            changed.add(variable)
+            return self.propagateAllDifferent(trail.domains, trail, changed)
+        return propagateWithAllDifferent
+
+    @propagation
+    def propagateAllDifferent(self, domains: Dict[Variable, Set[Value]], trail: 'Trail' = None, changed: Iterable[Variable] = None) -> bool:
+        """ Filters the domains with the AllDifferent constraints until none of them removes a value anymore.
+            :param changed: only the constraints of these variables are filtered first, all constraints if None.
+            :return: False as soon as a constraint can't be satisfied anymore, True otherwise.
+        """
+        if changed is None:
+            queue = deque(range(len(self.allDifferentConstraints)))
+        else:
+            queue = deque({i for var in changed for i in self.allDifferentOf.get(var, ())})
+        queued = set(queue)
+        while queue:
+            i = queue.popleft()
+            queued.remove(i)
+            constraint = self.allDifferentConstraints[i]
+            if trail is not None:
+                trail.explainBy(constraint)
+            removals = self.filterAllDifferent(constraint, domains)
+            if removals is None:
+                if trail is not None:
+                    trail.conflict = trail.reason
+                return False
+            self.pruned += len(removals)
+            for var, value in removals:
+                if trail is not None:
+                    trail.remove(var, value)
+                else:
+                    domains[var].remove(value)
+                for j in self.allDifferentOf[var]:
+                    if j not in queued:
+                        queued.add(j)
+                        queue.append(j)
+        return True
+
+    def filterAllDifferent(self, constraint: Tuple[Variable, ...], domains: Dict[Variable, Set[Value]]) -> Optional[List[Tuple[Variable, Value]]]:
+        """ Finds the values one AllDifferent constraint excludes from the domains of its variables:
+            - naked subsets: k variables whose domains together hold only k values take all of them,
+              so those values are removed from the other variables (k = 1 are the assigned/naked singles);
+            - hidden singles: when there are exactly as many values as variables every value must be used,
+              so a value that fits only one variable is assigned to it;
+            - if `matchingFilter` is set, every value that is in no maximum matching of variables to values (Régin).
+            :return: the (variable, value) pairs to remove, None if the constraint can't be satisfied.
+        """
+        current = {var: set(domains[var]) for var in constraint}
+        removals = []
+
+        def removeValue(var, value):
+            current[var].discard(value)
+            removals.append((var, value))
+            return len(current[var]) > 0
+
+        for size in range(1, min(self.nakedSubsetSize, len(constraint) - 1) + 1):
+            candidates = [var for var in constraint if len(current[var]) <= size]
+            for subset in combinations(candidates, size):
+                values = set().union(*(current[var] for var in subset))
+                if len(values) < size:
+                    return None
+                if len(values) > size:
+                    continue
+                for var in constraint:
+                    if var not in subset:
+                        for value in values & current[var]:
+                            if not removeValue(var, value):
+                                return None
+
+        values = set().union(*current.values())
+        if len(values) < len(constraint):
+            return None
+        if len(values) == len(constraint):
+            for value in values:
+                holders = [var for var in constraint if value in current[var]]
+                if len(holders) == 1 and len(current[holders[0]]) > 1:
+                    for other in list(current[holders[0]]):
+                        if other != value:
+                            removeValue(holders[0], other)
+
+        if self.matchingFilter:
+            unsupported = matchingFilter(constraint, current)
+            if unsupported is None:
+                return None
+            for var, value in unsupported:
+                if not removeValue(var, value):
+                    return None
+        return removals
+
 
 def domainsFromAssignment(assignment: Dict[Variable, Value], variables: Set[Variable]) -> Dict[Variable, Set[Value]]:
     """ Fills in the initial domains for each variable.
@@ -256,3 +1101,536 @@ def domainsFromAssignment(assignment: Dict[Variable, Value], variables: Set[Vari
     for var, val in assignment.items():
         domains[var] = {val}
     return domains
+
+
+def matchingFilter(variables: Tuple[Variable, ...], domains: Dict[Variable, Set[Value]]) -> Optional[List[Tuple[Variable, Value]]]:
+    """ Régin's filtering for one AllDifferent constraint: a value can stay in the domain of a variable
+        only if some maximum matching of the variables to distinct values uses it.
+        :return: the (variable, value) pairs that can be removed, None if no matching covers all variables.
+    """
+    matchOfValue = {}
+    matchOfVar = {}
+
+    def augment(var, seen) -> bool:
+        for value in domains[var]:
+            if value not in seen:
+                seen.add(value)
+                if value not in matchOfValue or augment(matchOfValue[value], seen):
+                    matchOfValue[value] = var
+                    matchOfVar[var] = value
+                    return True
+        return False
+
+    for var in variables:
+        if not augment(var, set()):
+            return None
+
+    # Matched edges point from variable to value, the other edges from value to variable
+    successors = {('var', var): [('value', matchOfVar[var])] for var in variables}
+    for var in variables:
+        for value in domains[var]:
+            successors.setdefault(('value', value), [])
+            if matchOfValue.get(value) is not var:
+                successors[('value', value)].append(('var', var))
+
+    # Edges on an alternating path from a free value can be used as well
+    reached = {node for node in successors if node[0] == 'value' and node[1] not in matchOfValue}
+    fringe = list(reached)
+    while fringe:
+        for successor in successors[fringe.pop()]:
+            if successor not in reached:
+                reached.add(successor)
+                fringe.append(successor)
+
+    component = stronglyConnectedComponents(successors)
+    unsupported = []
+    for var in variables:
+        for value in domains[var]:
+            if matchOfVar[var] != value and ('value', value) not in reached and component[('var', var)] != component[('value', value)]:
+                unsupported.append((var, value))
+    return unsupported
+
+
+def stronglyConnectedComponents(successors: Dict) -> Dict:
+    """ Tarjan's algorithm without recursion.
+        :param successors: node -> list of nodes it has an edge to, every node must be a key.
+        :return: node -> number of its strongly connected component.
+    """
+    index, low, component = {}, {}, {}
+    stack, onStack = [], set()
+    for root in successors:
+        if root in index:
+            continue
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        onStack.add(root)
+        work = [(root, iter(successors[root]))]
+        while work:
+            node, edges = work[-1]
+            for successor in edges:
+                if successor not in index:
+                    index[successor] = low[successor] = len(index)
+                    stack.append(successor)
+                    onStack.add(successor)
+                    work.append((successor, iter(successors[successor])))
+                    break
+                elif successor in onStack:
+                    low[node] = min(low[node], index[successor])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == index[node]:
+                    while True:
+                        member = stack.pop()
+                        onStack.remove(member)
+                        component[member] = index[node]
+                        if member == node:
+                            break
+    return component
+
+
+class BitsetDomains(MutableMapping):
+    """ The domains of all variables, each domain stored as an int bitmask over one table of values shared by all variables.
+        Can be used wherever a Dict[Variable, Set[Value]] of domains is expected: `domains[var]` is a set-like view on the bitmask.
+        Copying only copies one int per variable, size and emptiness checks don't iterate over values.
+    """
+
+    def __init__(self, values: List[Value], masks: Dict[Variable, int]):
+        self.table = values # bit i of a mask stands for table[i]
+        self.bits = {value: 1 << i for i, value in enumerate(values)}
+        self.masks = masks
+        self.empty = sum(1 for mask in masks.values() if not mask)
+
+    @classmethod
+    def fromSets(cls, domains: Dict[Variable, Set[Value]]) -> 'BitsetDomains':
+        """ Encodes domains given as sets. """
+        values = set().union(*domains.values())
+        try:
+            values = sorted(values)
+        except TypeError:
+            values = list(values)
+        result = cls(values, {})
+        result.masks = {var: result.encode(domain) for var, domain in domains.items()}
+        result.empty = sum(1 for mask in result.masks.values() if not mask)
+        return result
+
+    def encode(self, values: Iterable[Value]) -> int:
+        mask = 0
+        for value in values:
+            mask |= self.bits[value]
+        return mask
+
+    def decode(self, mask: int) -> List[Value]:
+        values = []
+        while mask:
+            low = mask & -mask
+            values.append(self.table[low.bit_length() - 1])
+            mask ^= low
+        return values
+
+    def mask(self, var: Variable) -> int:
+        return self.masks[var]
+
+    def setMask(self, var: Variable, mask: int):
+        self.empty += (not mask) - (not self.masks.get(var, 1))
+        self.masks[var] = mask
+
+    def size(self, var: Variable) -> int:
+        return self.masks[var].bit_count()
+
+    def hasEmptyDomain(self) -> bool:
+        return self.empty > 0
+
+    def copy(self) -> 'BitsetDomains':
+        result = copy.copy(self)
+        result.masks = self.masks.copy()
+        return result
+
+    def __deepcopy__(self, memodict={}):
+        return self.copy()
+
+    def __getitem__(self, var: Variable) -> 'DomainView':
+        if var not in self.masks:
+            raise KeyError(var)
+        return DomainView(self, var)
+
+    def __setitem__(self, var: Variable, values: Iterable[Value]):
+        self.setMask(var, self.encode(values))
+
+    def __delitem__(self, var: Variable):
+        self.empty -= not self.masks.pop(var)
+
+    def __iter__(self) -> Iterator[Variable]:
+        return iter(self.masks)
+
+    def __len__(self) -> int:
+        return len(self.masks)
+
+
+class DomainView(MutableSet):
+    """ The domain of one variable in `BitsetDomains`, changes are written through to the bitmask. """
+    __slots__ = ('domains', 'var')
+
+    def __init__(self, domains: BitsetDomains, var: Variable):
+        self.domains = domains
+        self.var = var
+
+    def __contains__(self, value: Value) -> bool:
+        return bool(self.domains.masks[self.var] & self.domains.bits.get(value, 0))
+
+    def __iter__(self) -> Iterator[Value]:
+        return iter(self.domains.decode(self.domains.masks[self.var]))
+
+    def __len__(self) -> int:
+        return self.domains.masks[self.var].bit_count()
+
+    def add(self, value: Value):
+        self.domains.setMask(self.var, self.domains.masks[self.var] | self.domains.bits[value])
+
+    def discard(self, value: Value):
+        self.domains.setMask(self.var, self.domains.masks[self.var] & ~self.domains.bits.get(value, 0))
+
+    def copy(self) -> Set[Value]:
+        return set(self)
+
+    def __repr__(self):
+        return repr(set(self))
+
+
+class Trail:
+    """ Undo log for domains that are changed in place during search.
+        Every removal is recorded, `Trail::undo` restores the domains to an earlier `Trail::mark` on backtrack,
+        so the solvers never have to copy the domains.
+        With explain=True the trail also keeps the culprits of every domain: the assigned variables that explain the
+        values removed from it. Removals are explained by `Trail::reason`, which `Trail::assign` sets to the assigned
+        variable and the propagators set with `Trail::explainBy` to the culprits of the domains they reason from.
+        The culprits are undone with the domains.
+    """
+
+    def __init__(self, domains: Dict[Variable, Set[Value]], explain: bool = False, counts: 'ConflictCounts' = None, mrv: 'DomainSizeIndex' = None):
+        """ :param counts: conflict counts to keep up to date with the removals and undos.
+            :param mrv: MRV index to keep up to date with the domain sizes and assignments.
+        """
+        self.domains = domains
+        self.counts = counts
+        self.mrv = mrv
+        self.bitset = isinstance(domains, BitsetDomains)
+        self.entries = [] # (var, removed value) for set domains, (var, previous mask) for bitset domains,
+                          # (var, previous culprits, CULPRITS) when explaining, (var, None, ASSIGNED) with an MRV index
+        self.culprits = {var: frozenset() for var in domains} if explain else None
+        self.reason = frozenset() # Explanation of the removals that are made now
+        self.conflict = frozenset() # Culprits of the last domain that became empty
+
+    def mark(self) -> int:
+        return len(self.entries)
+
+    def explainBy(self, variables: Iterable[Variable]):
+        """ Explains the next removals by the culprits of the domains of these variables. """
+        if self.culprits is not None:
+            self.reason = frozenset().union(*(self.culprits[var] for var in variables))
+
+    def _explain(self, var: Variable):
+        """ Adds the current reason to the culprits of var after a removal from its domain. """
+        culprits = self.culprits[var]
+        if not self.reason <= culprits:
+            self.entries.append((var, culprits, CULPRITS))
+            culprits = self.culprits[var] = culprits | self.reason
+        if not (self.domains.masks[var] if self.bitset else self.domains[var]):
+            self.conflict = culprits
+
+    def remove(self, var: Variable, value: Value):
+        if self.bitset:
+            self.setMask(var, self.domains.masks[var] & ~self.domains.bits[value])
+        else:
+            self.domains[var].remove(value)
+            self.entries.append((var, value))
+            if self.counts is not None:
+                self.counts.update(var, (value,), -1)
+            if self.mrv is not None:
+                self.mrv.resize(var, len(self.domains[var]))
+            if self.culprits is not None:
+                self._explain(var)
+
+    def setMask(self, var: Variable, mask: int):
+        """ Replaces the bitmask of var, only for `BitsetDomains`. """
+        old = self.domains.masks[var]
+        self.entries.append((var, old))
+        self.domains.setMask(var, mask)
+        if self.counts is not None:
+            self.counts.update(var, self.domains.decode(old & ~mask), -1)
+        if self.mrv is not None:
+            self.mrv.resize(var, mask.bit_count())
+        if self.culprits is not None:
+            self._explain(var)
+
+    def assign(self, var: Variable, value: Value):
+        """ Reduces the domain of var to value, and takes var out of the MRV index. """
+        if self.mrv is not None and self.mrv.remove(var):
+            self.entries.append((var, None, ASSIGNED))
+        if self.culprits is not None:
+            self.reason = frozenset((var,))
+            self._explain(var)
+        if self.bitset:
+            if self.domains.masks[var] != self.domains.bits[value]:
+                self.setMask(var, self.domains.bits[value])
+        else:
+            for other in list(self.domains[var]):
+                if other != value:
+                    self.remove(var, other)
+
+    def undo(self, mark: int):
+        """ Restores all removals made after mark, most recent first. """
+        entries = self.entries
+        while len(entries) > mark:
+            entry = entries.pop()
+            if len(entry) == 3:
+                var, old, kind = entry
+                if kind is CULPRITS:
+                    self.culprits[var] = old
+                else:
+                    self.mrv.add(var, len(self.domains[var]))
+                continue
+            var, old = entry
+            if self.bitset:
+                if self.counts is not None:
+                    self.counts.update(var, self.domains.decode(old & ~self.domains.masks[var]), 1)
+                self.domains.setMask(var, old)
+                if self.mrv is not None:
+                    self.mrv.resize(var, old.bit_count())
+            else:
+                self.domains[var].add(old)
+                if self.counts is not None:
+                    self.counts.update(var, (old,), 1)
+                if self.mrv is not None:
+                    self.mrv.resize(var, len(self.domains[var]))
+
+
+class DomainSizeIndex:
+    """ MRV index: the unassigned variables bucketed by domain size, so selecting one doesn't scan all variables.
+        Every bucket is a bitmask over the variables by variableIndex: the lowest bit of the first non-empty bucket is
+        the variable with the fewest values left, ties broken on variableIndex like the scan of `CSP::selectVariable`,
+        so both select the same variables.
+        A `Trail` moves a variable to another bucket on every domain change and takes it out while it is assigned.
+    """
+
+    def __init__(self, csp: CSP, domains: Dict[Variable, Set[Value]]):
+        self.order = csp.variableList
+        self.bit = {var: 1 << csp.variableIndex[var] for var in self.order}
+        self.sizes = {var: len(domains[var]) for var in self.order} # Domain size of every unassigned variable
+        self.buckets = [0] * (max(self.sizes.values(), default=0) + 1) # size -> bitmask of the ranks of its variables
+        for var, size in self.sizes.items():
+            self.buckets[size] |= self.bit[var]
+
+    def resize(self, var: Variable, size: int):
+        old = self.sizes.get(var)
+        if old is None or old == size:
+            return
+        bit = self.bit[var]
+        self.buckets[old] &= ~bit
+        self.buckets[size] |= bit
+        self.sizes[var] = size
+
+    def remove(self, var: Variable) -> bool:
+        """ Takes var out of the index when it is assigned.
+            :return: False if it was not in the index.
+        """
+        size = self.sizes.pop(var, None)
+        if size is None:
+            return False
+        self.buckets[size] &= ~self.bit[var]
+        return True
+
+    def add(self, var: Variable, size: int):
+        """ Puts var back in the index when it is unassigned. """
+        self.sizes[var] = size
+        self.buckets[size] |= self.bit[var]
+
+    def select(self) -> Optional[Variable]:
+        """ :return: the first unassigned variable with the smallest domain, None if all are assigned. """
+        for bucket in self.buckets:
+            if bucket:
+                return self.order[(bucket & -bucket).bit_length() - 1]
+        return None
+
+
+class ConflictCounts:
+    """ The count LCV sorts on: per value of a variable, the number of values left in the domains of its neighbors that
+        conflict with it. Per value it keeps a bitmask of the variables that still have it in their domain, which a `Trail`
+        updates with one bit on every removal and undo. A count is then a popcount of that bitmask and a mask of
+        `CSP::conflictMasks` per conflicting value, one for Sudoku, instead of checking all values of all neighbors.
+    """
+
+    def __init__(self, csp: CSP, domains: Dict[Variable, Set[Value]]):
+        self.csp = csp
+        self.index = csp.variableIndex
+        self.holders = {} # value -> bitmask of the variables with value in their domain
+        for var in domains:
+            bit = 1 << self.index[var]
+            for value in domains[var]:
+                self.holders[value] = self.holders.get(value, 0) | bit
+
+    def count(self, var: Variable, value: Value) -> int:
+        holders = self.holders
+        return sum((holders.get(neighborValue, 0) & mask).bit_count() for neighborValue, mask in self.csp.conflictMasks(var, value))
+
+    def update(self, var: Variable, values: Iterable[Value], delta: int):
+        """ Removes var from the holders of the values (delta -1, on removal) or adds it back (delta 1, on undo). """
+        holders = self.holders
+        bit = 1 << self.index[var]
+        for value in values:
+            if delta < 0:
+                holders[value] &= ~bit
+            else:
+                holders[value] |= bit
+
+
+class NogoodStore:
+    """ Bounded store of nogoods: sets of (variable, value) pairs that no solution contains together.
+        Every nogood is indexed by each of its pairs, and when the store is full the least recently used one is evicted.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.nogoods = OrderedDict() # nogood -> None, least recently used first
+        self.index = {} # (var, value) -> dict with the nogoods containing it as keys, in insertion order
+
+    def add(self, nogood: frozenset):
+        if not nogood or self.capacity <= 0:
+            return
+        if nogood in self.nogoods:
+            self.nogoods.move_to_end(nogood)
+            return
+        if len(self.nogoods) >= self.capacity:
+            evicted, _ = self.nogoods.popitem(last=False)
+            for literal in evicted:
+                del self.index[literal][evicted]
+        self.nogoods[nogood] = None
+        for literal in nogood:
+            self.index.setdefault(literal, {})[nogood] = None
+
+    def find(self, assignment: Dict[Variable, Value], var: Variable, value: Value) -> Optional[frozenset]:
+        """ :return: a nogood with (var, value) that the assignment contains completely, None if there is none. """
+        for nogood in self.index.get((var, value), ()):
+            if all(other in assignment and assignment[other] == otherValue for other, otherValue in nogood):
+                self.nogoods.move_to_end(nogood)
+                return nogood
+        return None
+
+    def __len__(self) -> int:
+        return len(self.nogoods)
+
+
+class SearchEngine:
+    """ Backtracking on reversible domains like `CSP::_solveTrail`, but iterative: the choice points are kept on an
+        explicit stack instead of the Python call stack, so the depth is not limited by the recursion limit and no frame
+        is paid per level. Supports the same propagation, AllDifferent constraints and restarts as `CSP::_solveWithTrail`.
+        The search is resumable: `SearchEngine::run` can stop after a number of nodes and continue where it left off
+        when called again. After a solution, calling it again continues with the next solution.
+    """
+    SOLVED = "solved"
+    EXHAUSTED = "exhausted"
+    PAUSED = "paused"
+
+    def __init__(self, csp: CSP, initialAssignment: Dict[Variable, Value], propagate):
+        """ :param propagate: `CSP::forwardCheckingInPlace` or `CSP::ac3InPlace`. """
+        self.csp = csp
+        self.assignment = dict(initialAssignment)
+        self.trail = csp.newTrail(csp.initialDomains(self.assignment))
+        self.propagate = csp._withAllDifferent(propagate) if csp.allDifferentConstraints else propagate
+        self.stack = [] # Choice points: [variable, values in order, index of the next value, trail mark]
+        self.expand = True # Whether the current assignment is a node that still has to be expanded
+        self.status = self.PAUSED
+        self.restartRun = 1 # Number of the current restart run, see `CSP::restarts`
+        csp.weights = {}
+        if not self._propagateGivens(initialAssignment):
+            self.status = self.EXHAUSTED
+        self.root = self.trail.mark()
+        self.rootAssignment = dict(self.assignment)
+        csp.failures, csp.failureLimit = 0, csp.restartBase * luby(self.restartRun) if csp.restarts else None
+
+    def _propagateGivens(self, initialAssignment: Dict[Variable, Value]) -> bool:
+        """ Checks the givens against each other, propagates them and preprocesses with SAC if `CSP::SAC` is set.
+            :return: False if that shows there is no solution.
+        """
+        csp = self.csp
+        if not csp.consistentGivens(initialAssignment):
+            return False
+        for var in initialAssignment:
+            if not self.propagate(self.assignment, self.trail, var):
+                return False
+        return not csp.SAC or csp.singletonArcConsistency(self.assignment, self.trail)
+
+    def run(self, maxNodes: int = None) -> Optional[Dict[Variable, Value]]:
+        """ Continues the search until a solution is found, the search space is exhausted, or maxNodes nodes were expanded.
+            `SearchEngine::status` tells which of the three happened.
+            :return: the solution (the engine's own assignment, copy it to keep it after continuing), None otherwise.
+        """
+        if self.status == self.EXHAUSTED:
+            return None
+        csp, trail, assignment, stack = self.csp, self.trail, self.assignment, self.stack
+        nodes = 0
+        while True:
+            if self.expand:
+                if maxNodes is not None and nodes >= maxNodes:
+                    self.status = self.PAUSED
+                    return None
+                nodes += 1
+                csp.nodes += 1
+                csp.maxDepth = max(csp.maxDepth, len(assignment))
+                if csp.isComplete(assignment):
+                    # Continuing after a solution makes its last value count as failed
+                    self.expand = False
+                    self.status = self.SOLVED
+                    return assignment
+                var = csp.selectVariable(assignment, trail.domains, index=trail.mrv)
+                stack.append([var, csp.orderDomain(assignment, trail.domains, var, trail.counts), 0, trail.mark()])
+                self.expand = False
+            if not stack:
+                self.status = self.EXHAUSTED
+                return None
+            choice = stack[-1]
+            var, values, i, mark = choice
+            if var in assignment:
+                # The previous value of this choice point failed
+                trail.undo(mark)
+                del assignment[var]
+                csp.backtracks += 1
+                csp.failures += 1
+                if csp.failureLimit is not None and csp.failures > csp.failureLimit:
+                    self.restart()
+                    continue
+            if i == len(values):
+                stack.pop()
+                continue
+            choice[2] = i + 1
+            assignment[var] = values[i]
+            if self.propagate(assignment, trail, var):
+                self.expand = True
+
+    def restart(self):
+        """ Goes back to the root for the next restart run, with the next failure limit of the Luby sequence. """
+        csp = self.csp
+        self.trail.undo(self.root)
+        self.assignment.clear()
+        self.assignment.update(self.rootAssignment)
+        self.stack.clear()
+        self.expand = True
+        self.restartRun += 1
+        csp.failures, csp.failureLimit = 0, csp.restartBase * luby(self.restartRun)
+
+    def split(self) -> List[Dict[Variable, Value]]:
+        """ Gives away the values not tried yet at the shallowest choice point that has any, as independent subproblems:
+            per value the assignment leading to that choice point plus the value. The engine itself no longer tries them.
+            Used to share work with idle workers, see `ParallelSearch`. Not meant to be combined with restarts.
+        """
+        for k, choice in enumerate(self.stack):
+            var, values, i, mark = choice
+            if i < len(values):
+                choice[1] = values[:i]
+                prefix = dict(self.rootAssignment)
+                for ancestor, _, _, _ in self.stack[:k]:
+                    prefix[ancestor] = self.assignment[ancestor]
+                return [{**prefix, var: value} for value in values[i:]]
+        return []
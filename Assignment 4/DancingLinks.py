@@ -0,0 +1,145 @@
+from typing import List, Iterable, Optional
+
+
+class DancingLinks:
+    """ Exact cover with Knuth's Algorithm X on dancing links (DLX).
+        Given rows that each cover some columns, finds rows that together cover every column exactly once.
+        The links are kept in flat lists of node indices: node 0 is the root, nodes 1..numColumns are the column headers
+        and the nodes of the rows follow. Covering a column unlinks it and every row that intersects it,
+        uncovering relinks them in reverse order, so backtracking never copies anything.
+    """
+
+    def __init__(self, numColumns: int, rows: Iterable[Iterable[int]]):
+        """ :param rows: per row the columns (0 to numColumns - 1) it covers. """
+        n = numColumns
+        self.left = [i - 1 for i in range(n + 1)]
+        self.right = [i + 1 for i in range(n + 1)]
+        self.left[0], self.right[n] = n, 0
+        self.up = list(range(n + 1))
+        self.down = list(range(n + 1))
+        self.column = list(range(n + 1))
+        self.size = [0] * (n + 1) # Number of rows left in each column
+        self.rowOf = [-1] * (n + 1) # Row index of each node, -1 for the root and the headers
+        self.rowStart = [] # First node of each row
+        self.nodes = 0 # Number of search nodes visited by `DancingLinks::solve`
+        self.maxDepth = 0 # Most rows in the partial solution of `DancingLinks::solve` at once
+        for r, columns in enumerate(rows):
+            first = None
+            for col in columns:
+                c = col + 1
+                node = len(self.column)
+                self.column.append(c)
+                self.rowOf.append(r)
+                # Insert at the bottom of the column
+                self.up.append(self.up[c])
+                self.down.append(c)
+                self.down[self.up[c]] = node
+                self.up[c] = node
+                self.size[c] += 1
+                # Insert at the end of the row
+                if first is None:
+                    first = node
+                    self.left.append(node)
+                    self.right.append(node)
+                else:
+                    self.left.append(self.left[first])
+                    self.right.append(first)
+                    self.right[self.left[first]] = node
+                    self.left[first] = node
+            self.rowStart.append(first)
+
+    def cover(self, c: int):
+        """ Removes column header c from the header list and all rows intersecting it from the other columns. """
+        left, right, up, down, column, size = self.left, self.right, self.up, self.down, self.column, self.size
+        right[left[c]] = right[c]
+        left[right[c]] = left[c]
+        i = down[c]
+        while i != c:
+            j = right[i]
+            while j != i:
+                down[up[j]] = down[j]
+                up[down[j]] = up[j]
+                size[column[j]] -= 1
+                j = right[j]
+            i = down[i]
+
+    def uncover(self, c: int):
+        """ Undoes `DancingLinks::cover` of column header c. """
+        left, right, up, down, column, size = self.left, self.right, self.up, self.down, self.column, self.size
+        i = up[c]
+        while i != c:
+            j = left[i]
+            while j != i:
+                size[column[j]] += 1
+                down[up[j]] = j
+                up[down[j]] = j
+                j = left[j]
+            i = up[i]
+        right[left[c]] = c
+        left[right[c]] = c
+
+    def isCovered(self, c: int) -> bool:
+        return self.right[self.left[c]] != c
+
+    def select(self, row: int) -> bool:
+        """ Puts a row in the solution up front, by covering its columns.
+            :return: False if one of its columns is already covered (the row conflicts with an earlier selection).
+        """
+        start = self.rowStart[row]
+        if start is None:
+            return True
+        j = start
+        while True:
+            if self.isCovered(self.column[j]):
+                return False
+            j = self.right[j]
+            if j == start:
+                break
+        while True:
+            self.cover(self.column[j])
+            j = self.right[j]
+            if j == start:
+                return True
+
+    def solve(self) -> Optional[List[int]]:
+        """ Covers the remaining columns.
+            :return: the indices of the rows of an exact cover (without the selected rows), None if there is none.
+        """
+        solution = []
+        return solution if self._search(solution) else None
+
+    def _search(self, solution: List[int]) -> bool:
+        """ Algorithm X: covers the column with the fewest rows left and tries each of its rows. """
+        self.nodes += 1
+        self.maxDepth = max(self.maxDepth, len(solution))
+        left, right, down, column, size = self.left, self.right, self.down, self.column, self.size
+        c = right[0]
+        if c == 0:
+            return True
+        best = c
+        j = right[c]
+        while j != 0 and size[best] > 1:
+            if size[j] < size[best]:
+                best = j
+            j = right[j]
+        c = best
+        if size[c] == 0:
+            return False
+        self.cover(c)
+        r = down[c]
+        while r != c:
+            solution.append(self.rowOf[r])
+            j = right[r]
+            while j != r:
+                self.cover(column[j])
+                j = right[j]
+            if self._search(solution):
+                return True
+            j = left[r]
+            while j != r:
+                self.uncover(column[j])
+                j = left[j]
+            solution.pop()
+            r = down[r]
+        self.uncover(c)
+        return False
@@ -0,0 +1,175 @@
+""" Solves one hard CSP with backtracking split over several processes.
+    The top levels of the search tree are split into independent subproblems by the values of the MRV variable,
+    recursively, and the subproblems are put in a shared queue the workers take them from. A worker that runs out of
+    subproblems marks itself idle, a busy worker that notices this while the queue is empty gives away the untried
+    values of its shallowest choice point (`SearchEngine::split`), so the work keeps being shared until the end.
+    The first solution found stops all workers.
+
+    Usage: python ParallelSearch.py sudoku.txt [--workers N] [--ac3] [--timeout S]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import time
+
+from collections import deque
+from typing import Dict, List, Tuple, Optional
+
+from CSP import CSP, Variable, Value, SearchEngine
+from Portfolio import applyOptions
+
+
+class ParallelResult:
+    """ Outcome of `solveParallel`. """
+
+    def __init__(self, assignment: Optional[Dict[Variable, Value]], seconds: float, nodes: int, subproblems: int, steals: int):
+        self.assignment = assignment # None if there is no solution, or none was found in time
+        self.seconds = seconds
+        self.nodes = nodes # Search nodes of the subproblems that were reported back, summed over the workers
+        self.subproblems = subproblems # Number of subproblems of the initial split
+        self.steals = steals # Number of times a busy worker gave away work to idle workers
+
+    def toJson(self) -> str:
+        return json.dumps({'solved': self.assignment is not None, 'seconds': self.seconds, 'nodes': self.nodes,
+                           'subproblems': self.subproblems, 'steals': self.steals})
+
+
+def splitSubproblems(csp: CSP, initialAssignment: Dict[Variable, Value], count: int, propagate) -> List[Dict[Variable, Value]]:
+    """ Splits the top levels of the search into at least count independent subproblems (fewer if the tree is smaller),
+        breadth first: a subproblem is replaced by one per value of its MRV variable, in the order of `CSP::orderDomain`.
+        Values that fail propagation are left out, so the subproblems together hold every solution.
+        :param propagate: `CSP::forwardCheckingInPlace` or `CSP::ac3InPlace`.
+    """
+    frontier = deque([dict(initialAssignment)])
+    while frontier and len(frontier) < count:
+        assignment = frontier.popleft()
+        engine = SearchEngine(csp, assignment, propagate)
+        if engine.status == SearchEngine.EXHAUSTED:
+            continue
+        if csp.isComplete(engine.assignment):
+            return [assignment]
+        trail = engine.trail
+        var = csp.selectVariable(engine.assignment, trail.domains, index=trail.mrv)
+        for value in csp.orderDomain(engine.assignment, trail.domains, var, trail.counts):
+            mark = trail.mark()
+            engine.assignment[var] = value
+            if engine.propagate(engine.assignment, trail, var):
+                frontier.append({**assignment, var: value})
+            trail.undo(mark)
+            del engine.assignment[var]
+    return list(frontier)
+
+
+def _encode(csp: CSP, assignment: Dict[Variable, Value]) -> Tuple[Tuple[int, Value], ...]:
+    """ The variables are copies in every process, so subproblems are sent as (position in variableList, value) pairs. """
+    return tuple((csp.variableIndex[var], value) for var, value in assignment.items())
+
+
+def _worker(csp: CSP, propagate: str, options: Dict, sliceNodes: int, tasks, results, idle, stop):
+    """ Runs in a worker process: solves subproblems from tasks until stop is set, and reports to results
+        ('split', encoded subproblems given away) and ('done', solution values or None, nodes) after each subproblem.
+        The parent puts the given away subproblems in tasks, after counting them: if the worker put them there itself,
+        another worker could report one done before the parent saw the split, and take the search for exhausted.
+    """
+    applyOptions(csp, options)
+    csp.restarts = False
+    propagate = getattr(csp, propagate)
+    waiting = False
+    while not stop.is_set():
+        try:
+            task = tasks.get(timeout=0.01)
+        except queue.Empty:
+            if not waiting:
+                waiting = True
+                with idle.get_lock():
+                    idle.value += 1
+            continue
+        if waiting:
+            waiting = False
+            with idle.get_lock():
+                idle.value -= 1
+        nodes = csp.nodes
+        engine = SearchEngine(csp, {csp.variableList[i]: value for i, value in task}, propagate)
+        result = None
+        while engine.status == SearchEngine.PAUSED and not stop.is_set():
+            result = engine.run(sliceNodes)
+            if engine.status == SearchEngine.PAUSED and idle.value > 0 and tasks.empty():
+                subproblems = engine.split()
+                if subproblems:
+                    results.put(('split', [_encode(csp, subproblem) for subproblem in subproblems]))
+        values = None if result is None else [result.get(var) for var in csp.variableList]
+        results.put(('done', values, csp.nodes - nodes))
+
+
+def solveParallel(csp: CSP, initialAssignment: Dict[Variable, Value] = dict(), workers: int = None,
+                  propagate: str = "forwardCheckingInPlace", options: Dict = dict(), subproblemsPerWorker: int = 4,
+                  sliceNodes: int = 200, timeout: float = None) -> ParallelResult:
+    """ Backtracking with the propagation of `CSP::solveForwardCheckingIterative` (or AC3), split over worker processes.
+        Needs `CSP::freezeConstraintGraph`, the solution is mapped back to the variables of csp by their position.
+        :param workers: number of processes, the number of CPUs by default.
+        :param propagate: name of the propagator, "forwardCheckingInPlace" or "ac3InPlace".
+        :param options: set on the CSP of every worker, as in `Portfolio::applyOptions`. Restarts are turned off.
+        :param subproblemsPerWorker: the initial split aims for this many subproblems per worker.
+        :param sliceNodes: nodes a worker searches between checks for idle workers.
+        :param timeout: seconds after which all workers are stopped, None to wait for the answer.
+    """
+    assert csp.variableList is not None, "The parallel search needs a CSP with a frozen constraint graph"
+    workers = workers if workers is not None else os.cpu_count()
+    start = time.perf_counter()
+    subproblems = splitSubproblems(csp, initialAssignment, workers * subproblemsPerWorker, getattr(csp, propagate))
+    tasks, results = multiprocessing.Queue(), multiprocessing.Queue()
+    idle, stop = multiprocessing.Value('i', 0), multiprocessing.Event()
+    for subproblem in subproblems:
+        tasks.put(_encode(csp, subproblem))
+    processes = [multiprocessing.Process(target=_worker, args=(csp, propagate, options, sliceNodes, tasks, results, idle, stop), daemon=True)
+                 for _ in range(workers if subproblems else 0)]
+    for process in processes:
+        process.start()
+    pending, nodes, steals, values = len(subproblems), 0, 0, None
+    try:
+        while pending > 0:
+            remaining = None if timeout is None else max(0.0, timeout - (time.perf_counter() - start))
+            try:
+                message = results.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if message[0] == 'split':
+                pending += len(message[1])
+                steals += 1
+                for task in message[1]:
+                    tasks.put(task)
+            else:
+                _, values, subproblemNodes = message
+                nodes += subproblemNodes
+                pending -= 1
+                if values is not None:
+                    break
+    finally:
+        stop.set()
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join()
+    assignment = None if values is None else {var: value for var, value in zip(csp.variableList, values) if value is not None}
+    return ParallelResult(assignment, time.perf_counter() - start, nodes, len(subproblems), steals)
+
+
+if __name__ == '__main__':
+    from Sudoku import Sudoku
+
+    parser = argparse.ArgumentParser(description="Solve a Sudoku with backtracking split over several processes.")
+    parser.add_argument("sudoku", help="file in the format of Sudoku::parseAssignment")
+    parser.add_argument("--workers", type=int, default=None, help="number of processes, the number of CPUs by default")
+    parser.add_argument("--ac3", action="store_true", help="propagate with AC3 instead of forward checking")
+    parser.add_argument("--timeout", type=float, default=None, help="seconds after which all workers are stopped")
+    args = parser.parse_args()
+    sudoku = Sudoku()
+    parallel = solveParallel(sudoku, sudoku.parseAssignment(args.sudoku), args.workers,
+                             "ac3InPlace" if args.ac3 else "forwardCheckingInPlace", timeout=args.timeout)
+    if parallel.assignment is not None:
+        print(sudoku.assignmentToStr(parallel.assignment))
+    print(f"solved: {parallel.assignment is not None} in {parallel.seconds:.3f}s, {parallel.nodes} nodes, "
+          f"{parallel.subproblems} subproblems, {parallel.steals} steals")
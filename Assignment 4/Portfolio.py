@@ -0,0 +1,119 @@
+""" Solves one CSP with a portfolio of solver configurations, each in its own process.
+    The first configuration to finish wins and the others are terminated. The result reports which configuration won,
+    so the defaults can be tuned from the logged results.
+
+    Usage: python Portfolio.py sudoku.txt [--timeout S] [--log PATH]
+"""
+import argparse
+import json
+import multiprocessing
+import queue
+import random
+import time
+
+from typing import Dict, List, Tuple, Optional
+
+from CSP import CSP, Variable, Value, SolveStats
+
+
+# (solve method, options) pairs; the options are set as attributes of the CSP, 'seed' reseeds its random generator
+DEFAULT_PORTFOLIO = [("solveForwardCheckingTrail", {}),
+                     ("solveAC3Trail", {}),
+                     ("solveForwardCheckingTrail", {'domWdeg': True, 'seed': 1}),
+                     ("solveForwardCheckingCBJ", {}),
+                     ("solveForwardCheckingTrail", {'LCV': False})]
+
+
+class PortfolioResult:
+    """ Outcome of `solvePortfolio`: the assignment of the winning configuration and which one it was. """
+
+    def __init__(self, assignment: Optional[Dict[Variable, Value]], configuration: Optional[Tuple[str, Dict]], seconds: float, stats: Optional[SolveStats]):
+        self.assignment = assignment # None if the winner proved there is no solution, or nobody finished in time
+        self.configuration = configuration # None if nobody finished in time
+        self.seconds = seconds
+        self.stats = stats # `SolveStats` of the winner
+
+    def toJson(self) -> str:
+        method, options = self.configuration if self.configuration is not None else (None, None)
+        return json.dumps({'method': method, 'options': options, 'solved': self.assignment is not None,
+                           'seconds': self.seconds, 'stats': self.stats.__dict__ if self.stats is not None else None})
+
+
+def applyOptions(csp: CSP, options: Dict):
+    """ Sets the options of a configuration on the CSP. """
+    for name, value in options.items():
+        if name == 'seed':
+            csp.random = random.Random(value)
+        else:
+            setattr(csp, name, value)
+
+
+def _solveConfiguration(csp: CSP, initialAssignment: Dict[Variable, Value], i: int, method: str, options: Dict, results):
+    """ Runs in a worker process. The variables of the CSP here are copies of those of the parent,
+        so the solution is sent back as a list of values in the order of variableList.
+    """
+    applyOptions(csp, options)
+    try:
+        result = getattr(csp, method)(initialAssignment)
+    except Exception:
+        results.put((i, False, None, None))
+        raise
+    values = None if result is None else [result.get(var) for var in csp.variableList]
+    results.put((i, True, values, csp.lastStats))
+
+
+def solvePortfolio(csp: CSP, initialAssignment: Dict[Variable, Value] = dict(),
+                   configurations: List[Tuple[str, Dict]] = DEFAULT_PORTFOLIO, timeout: float = None) -> PortfolioResult:
+    """ Runs every configuration on its own copy of the CSP in a separate process, the first one to finish wins.
+        A configuration that fails with an exception doesn't count as finished.
+        Needs `CSP::freezeConstraintGraph`, the solution is mapped back to the variables of csp by their position.
+        :param timeout: seconds after which all configurations are stopped, None to wait for the first one.
+    """
+    assert csp.variableList is not None, "The portfolio needs a CSP with a frozen constraint graph"
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=_solveConfiguration, args=(csp, initialAssignment, i, method, options, results), daemon=True)
+                 for i, (method, options) in enumerate(configurations)]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+    winner = None
+    try:
+        for _ in processes:
+            remaining = None if timeout is None else max(0.0, timeout - (time.perf_counter() - start))
+            try:
+                i, finished, values, stats = results.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if finished:
+                winner = (i, values, stats)
+                break
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join()
+    seconds = time.perf_counter() - start
+    if winner is None:
+        return PortfolioResult(None, None, seconds, None)
+    i, values, stats = winner
+    assignment = None if values is None else {var: value for var, value in zip(csp.variableList, values) if value is not None}
+    return PortfolioResult(assignment, configurations[i], seconds, stats)
+
+
+if __name__ == '__main__':
+    from Sudoku import Sudoku
+
+    parser = argparse.ArgumentParser(description="Solve a Sudoku with a portfolio of solver configurations.")
+    parser.add_argument("sudoku", help="file in the format of Sudoku::parseAssignment")
+    parser.add_argument("--timeout", type=float, default=None, help="seconds after which all configurations are stopped")
+    parser.add_argument("--log", default=None, help="append the result to this file as a JSON line")
+    args = parser.parse_args()
+    sudoku = Sudoku()
+    portfolio = solvePortfolio(sudoku, sudoku.parseAssignment(args.sudoku), timeout=args.timeout)
+    if portfolio.assignment is not None:
+        print(sudoku.assignmentToStr(portfolio.assignment))
+    print(f"winner: {portfolio.configuration} after {portfolio.seconds:.3f}s")
+    if args.log is not None:
+        with open(args.log, "a") as log:
+            log.write(portfolio.toJson() + "\n")
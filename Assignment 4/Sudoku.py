@@ -1,31 +1,62 @@
-from typing import Set, Dict
+from typing import Set, Dict, Optional, Iterable
 
-from CSP import CSP, Variable, Value
+from CSP import CSP, Variable, Value, recordTelemetry
+from DancingLinks import DancingLinks
+
+VALUE_CHARS = "123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ" # Compact format: one character per cell, 'A' is 10, ..., 'P' is 25
+EMPTY_CHARS = "0."
+
+
+def valueToChar(value: Value) -> str:
+    return VALUE_CHARS[value - 1]
+
+
+def charToValue(char: str) -> Optional[Value]:
+    """ :return: the value of a character of the compact format, None for an empty cell. """
+    if char in EMPTY_CHARS:
+        return None
+    assert char.upper() in VALUE_CHARS, f"Impossible value in grid"
+    return VALUE_CHARS.index(char.upper()) + 1
 
-regions = [[1, 1, 1, 2, 2, 2, 3, 3, 3],
-           [1, 1, 1, 2, 2, 2, 3, 3, 3],
-           [1, 1, 1, 2, 2, 2, 3, 3, 3],
-           [4, 4, 4, 5, 5, 5, 6, 6, 6],
-           [4, 4, 4, 5, 5, 5, 6, 6, 6],
-           [4, 4, 4, 5, 5, 5, 6, 6, 6],
-           [7, 7, 7, 8, 8, 8, 9, 9, 9],
-           [7, 7, 7, 8, 8, 8, 9, 9, 9],
-           [7, 7, 7, 8, 8, 8, 9, 9, 9]]
 
 class Sudoku(CSP):
-    def __init__(self, MRV=True, LCV=True):
-        super().__init__(MRV=MRV, LCV=LCV)
+    def __init__(self, MRV=True, LCV=True, bitsetDomains=True, allDifferent=False, matchingFilter=False, domWdeg=False, restarts=False, seed=None, boxSize=3):
+        """ :param allDifferent: declare the rows, columns and regions as AllDifferent constraints.
+            :param matchingFilter: also use matching based filtering for the AllDifferent constraints.
+            :param boxSize: width of a region, the board has boxSize^2 rows, columns and values (3 for 9x9, 4 for 16x16).
+                            At most 5, the compact format has no characters for more than 35 values. """
+        assert boxSize * boxSize <= len(VALUE_CHARS), f"A box size of at most 5 is supported, not {boxSize}"
+        super().__init__(MRV=MRV, LCV=LCV, bitsetDomains=bitsetDomains, domWdeg=domWdeg, restarts=restarts, seed=seed)
+        self.boxSize = boxSize
+        self.size = boxSize * boxSize
         self._variables = []
-        for x in range(9):
+        for x in range(self.size):
             row = []
-            for y in range(9):
-                row.append(Cell(x,y))
+            for y in range(self.size):
+                row.append(Cell(x, y, self.size))
             self._variables.append(row)
+        self._variableSet = frozenset(i for lst in self._variables for i in lst)
+        self.freezeConstraintGraph(self.getCell(x, y) for y in range(self.size) for x in range(self.size))
+        self.matchingFilter = matchingFilter
+        if allDifferent:
+            self.declareUnits()
+
+    def declareUnits(self):
+        """ Declares every row, column and region as an AllDifferent constraint. """
+        n = self.size
+        for i in range(n):
+            self.addAllDifferent(self.getCell(x, i) for x in range(n))
+            self.addAllDifferent(self.getCell(i, y) for y in range(n))
+            self.addAllDifferent(self.getCell(x, y) for x in range(n) for y in range(n) if self.region(x, y) == i)
+
+    def region(self, x: int, y: int) -> int:
+        """ Returns the index of the region of the cell on (x, y), numbered row by row from 0. """
+        return (y // self.boxSize) * self.boxSize + x // self.boxSize
 
     @property
     def variables(self) -> Set['Cell']:
         """ Return the set of variables in this CSP. """
-        return {i for lst in self._variables for i in lst}
+        return self._variableSet
 
 
     def getCell(self, x: int, y: int) -> 'Cell':
@@ -33,72 +64,120 @@ class Sudoku(CSP):
         return self._variables[x][y]
 
     def neighbors(self, var: 'Cell') -> Set['Cell']:
-        """ Return all variables related to var by some constraint. """
-        neighbors = set()
+        """ Return all variables related to var by some constraint.
+            Only called once per cell, by `CSP::freezeConstraintGraph`. """
         xpos,ypos = var.Xpos,var.Ypos
-        for x in range(9):
-            for y in range(9):
-                if x == xpos and y == ypos:
-                    continue
-                elif regions[x][y]==regions[xpos][ypos] or x == xpos or y == ypos:
-                    neighbors.add(self._variables[x][y])
+        left, top = xpos - xpos % self.boxSize, ypos - ypos % self.boxSize
+        neighbors = {self._variables[x][ypos] for x in range(self.size)}
+        neighbors.update(self._variables[xpos][y] for y in range(self.size))
+        neighbors.update(self._variables[x][y] for x in range(left, left + self.boxSize) for y in range(top, top + self.boxSize))
+        neighbors.discard(var)
         return neighbors
 
     def isValidPairwise(self, var1: 'Cell', val1: Value, var2: 'Cell', val2: Value) -> bool:
         """ Return whether this pairwise assignment is valid with the constraints of the csp. """
-        return not((regions[var1.Xpos][var1.Ypos]==regions[var2.Xpos][var2.Ypos] or var1.Xpos == var2.Xpos or var1.Ypos == var2.Ypos) and val1 == val2)
+        return val1 != val2 or var2 not in self.neighbors(var1)
+
+    @recordTelemetry
+    def solveDancingLinks(self, initialAssignment: Dict['Cell', Value] = dict()) -> Optional[Dict['Cell', Value]]:
+        """ Solves this Sudoku as an exact cover problem with `DancingLinks`, without the generic CSP machinery.
+            A row is a value in a cell, it covers four columns: the cell, and the value in its row, column and region.
+            :return: the same assignment dict as the CSP solvers, None if there is no solution.
+        """
+        n = self.size
+        candidates = [(self.getCell(x, y), val) for y in range(n) for x in range(n) for val in range(1, n + 1)]
+        rowIndex = {candidate: i for i, candidate in enumerate(candidates)}
+        links = DancingLinks(4 * n * n, ([n * cell.Ypos + cell.Xpos,
+                                          n * n + n * cell.Ypos + val - 1,
+                                          2 * n * n + n * cell.Xpos + val - 1,
+                                          3 * n * n + n * self.region(cell.Xpos, cell.Ypos) + val - 1] for cell, val in candidates))
+        for var, val in initialAssignment.items():
+            if not links.select(rowIndex[(var, val)]):
+                return None
+        rows = links.solve()
+        self.nodes += links.nodes
+        self.maxDepth = max(self.maxDepth, len(initialAssignment) + links.maxDepth)
+        if rows is None:
+            return None
+        assignment = dict(initialAssignment)
+        assignment.update(candidates[row] for row in rows)
+        return assignment
+
+    def conflictingValues(self, var: 'Cell', value: Value, neighbor: 'Cell') -> Iterable[Value]:
+        """ Neighboring cells only conflict on the same value. """
+        return (value,)
 
     def assignmentToStr(self, assignment: Dict['Cell', Value]) -> str:
         """ Formats the assignment of variables for this CSP into a string. """
         s = ""
-        for y in range(9):
-            if y != 0 and y % 3 == 0:
-                s += "---+---+---\n"
-            for x in range(9):
-                if x != 0 and x % 3 == 0:
+        for y in range(self.size):
+            if y != 0 and y % self.boxSize == 0:
+                s += "+".join(["-" * self.boxSize] * self.boxSize) + "\n"
+            for x in range(self.size):
+                if x != 0 and x % self.boxSize == 0:
                     s += '|'
 
                 cell = self.getCell(x, y)
-                s += str(assignment.get(cell, ' '))
+                s += valueToChar(assignment[cell]) if cell in assignment else ' '
             s += "\n"
         return s
 
+    def assignmentToLine(self, assignment: Dict['Cell', Value]) -> str:
+        """ Formats the assignment on one line of size^2 characters, row by row, in the format of `Sudoku::parseLine`. """
+        return "".join(valueToChar(assignment[cell]) if cell in assignment else '.'
+                       for cell in (self.getCell(x, y) for y in range(self.size) for x in range(self.size)))
+
     def parseAssignment(self, path: str) -> Dict['Cell', Value]:
-        """ Gives an initial assignment for a Sudoku board from file. """
+        """ Gives an initial assignment for a Sudoku board from file, one row per line.
+            A row is either size values separated by whitespace (numbers, 0 for an empty cell),
+            or size characters of the compact format of `Sudoku::parseLine`, optionally with whitespace in between.
+        """
         initialAssignment = dict()
 
         with open(path, "r") as file:
-            for y, line in enumerate(file.readlines()):
-                if line.isspace():
+            rows = [line for line in file.readlines() if not line.isspace()]
+        assert len(rows) <= self.size, "Too many rows in sudoku"
+        for y, line in enumerate(rows):
+            tokens = line.split()
+            if len(tokens) == self.size:
+                values = [int(token) if token.isdigit() else charToValue(token) for token in tokens]
+            else:
+                values = [charToValue(char) for char in "".join(tokens)]
+            assert len(values) <= self.size, "Too many columns in sudoku"
+
+            for x, val in enumerate(values):
+                if not val:
                     continue
-                assert y < 9, "Too many rows in sudoku"
-
-                for x, char in enumerate(line):
-                    if char.isspace():
-                        continue
-
-                    assert x < 9, "Too many columns in sudoku"
-
-                    var = self.getCell(x, y)
-                    val = int(char)
-
-                    if val == 0:
-                        continue
+                assert 0 < val <= self.size, f"Impossible value in grid"
+                initialAssignment[self.getCell(x, y)] = val
+        return initialAssignment
 
-                    assert val > 0 and val < 10, f"Impossible value in grid"
-                    initialAssignment[var] = val
+    def parseLine(self, line: str) -> Dict['Cell', Value]:
+        """ Gives an initial assignment for a Sudoku board written on one line of size^2 characters, row by row.
+            Values above 9 are letters ('A' is 10, ..., 'P' is 25), empty cells are written as '0' or '.'.
+        """
+        line = line.strip()
+        assert len(line) == self.size * self.size, f"A sudoku line needs {self.size * self.size} cells"
+        initialAssignment = dict()
+        for i, char in enumerate(line):
+            val = charToValue(char)
+            if val is None:
+                continue
+            assert val <= self.size, f"Impossible value in grid"
+            initialAssignment[self.getCell(i % self.size, i // self.size)] = val
         return initialAssignment
 
 
 class Cell(Variable):
-    def __init__(self, Xpos, Ypos):
+    def __init__(self, Xpos, Ypos, size=9):
         super().__init__()
         self.Xpos = Xpos
         self.Ypos = Ypos
+        self.size = size
 
     @property
     def startDomain(self) -> Set[Value]:
         """ Returns the set of initial values of this variable (not taking constraints into account). """
-        return set(range(1,10))
+        return set(range(1, self.size + 1))
 
 